@@ -0,0 +1,313 @@
+"""Headless self-play arena for comparing engine configurations.
+
+    python arena.py "ai:depth=4" "ai:depth=2" --games 200 --workers 4
+    python arena.py "ai:budget=0.05,three=8" greedy --games 100 --output games.jsonl
+
+An engine spec is a kind, optionally followed by ":" and comma-separated
+key=value settings. Kinds are "ai" (AIPlayer; settings depth, budget, two,
+three, win, tt, ordering=static|heuristic), "random" and "greedy" (takes a win,
+blocks a loss, otherwise the move with the best static evaluation).
+
+Games are played in pairs from the same random opening, once with each engine
+moving first, and results stream out as they finish.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from board import new_board
+from cpu_player import new_cpu_player, possible_moves
+from domain import IBoard, LogEntry
+from evaluation import EvalWeights, Evaluator
+from move_ordering import new_move_orderer
+
+
+class RandomPlayer:
+    def __init__(self, board: IBoard, player_no: int, seed: int) -> None:
+        self.__board = board
+        self.__rng = random.Random(seed)
+        self.__time_elapsed: float = 0
+
+    def move(self) -> int:
+        start = time.perf_counter()
+        move = self.__rng.choice(possible_moves(self.__board))
+        self.__time_elapsed = time.perf_counter() - start
+        return move
+
+    def stats(self) -> LogEntry:
+        return LogEntry(0, 0, self.__time_elapsed)
+
+
+class GreedyPlayer:
+    """One-ply baseline: wins if it can, blocks if it must, else maximizes the evaluation"""
+
+    def __init__(self, board: IBoard, player_no: int, seed: int) -> None:
+        self.__board = board
+        self.__player_no = player_no
+        self.__rng = random.Random(seed)
+        self.__evaluator = Evaluator()
+        self.__time_elapsed: float = 0
+
+    def move(self) -> int:
+        start = time.perf_counter()
+        board = self.__board
+        me, opponent = self.__player_no, 3 - self.__player_no
+        moves = possible_moves(board)
+        scores = {}
+        blocks = []
+        for move in moves:
+            board.accept_move(move, me)
+            scores[move] = (
+                math.inf
+                if board.check_win(me)
+                else self.__evaluator.evaluate(board, me)
+            )
+            board.undo_move()
+            board.accept_move(move, opponent)
+            if board.check_win(opponent):
+                blocks.append(move)
+            board.undo_move()
+        best = max(scores.values())
+        if best != math.inf and blocks:
+            choice = blocks[0]
+        else:
+            choice = self.__rng.choice([move for move in moves if scores[move] == best])
+        self.__time_elapsed = time.perf_counter() - start
+        return choice
+
+    def stats(self) -> LogEntry:
+        return LogEntry(0, 0, self.__time_elapsed)
+
+
+def parse_spec(spec: str) -> tuple[str, dict[str, str]]:
+    kind, _, settings = spec.partition(":")
+    options = {}
+    for setting in filter(None, settings.split(",")):
+        key, _, value = setting.partition("=")
+        options[key.strip()] = value.strip()
+    if kind not in ("ai", "random", "greedy"):
+        raise ValueError(f"Unknown engine kind {kind!r} in {spec!r}")
+    return kind, options
+
+
+def new_engine(spec: str, board: IBoard, player_no: int, seed: int):
+    kind, options = parse_spec(spec)
+    if kind == "random":
+        return RandomPlayer(board, player_no, seed)
+    if kind == "greedy":
+        return GreedyPlayer(board, player_no, seed)
+    defaults = EvalWeights()
+    ai = new_cpu_player(
+        board,
+        player_no,
+        3 - player_no,
+        tt_size=int(options.get("tt", 1 << 16)),
+        time_budget=float(options["budget"]) if "budget" in options else None,
+        move_orderer=new_move_orderer(
+            board.columns(), options.get("ordering", "heuristic") == "heuristic"
+        ),
+        eval_weights=EvalWeights(
+            float(options.get("two", defaults.two)),
+            float(options.get("three", defaults.three)),
+            float(options.get("win", defaults.win)),
+        ),
+    )
+    ai.depth = int(options.get("depth", ai.depth))
+    return ai
+
+
+def play_game(first: str, second: str, opening_plies: int, seed: int) -> dict:
+    """Plays one game, `first` moving first after `opening_plies` random moves, so
+    as player 2 when the opening is odd. Returns the winner (1, 2 or 0 for a draw)
+    and which player `first` was, with per-player move statistics."""
+    rng = random.Random(seed)
+    board = new_board(7, 6)
+    for ply in range(opening_plies):
+        player = ply % 2 + 1
+        board.accept_move(rng.choice(possible_moves(board)), player)
+        if board.check_win(player):
+            # a random opening that wins outright isn't a useful game; replay it
+            return play_game(first, second, opening_plies, rng.getrandbits(32))
+    first_player = opening_plies % 2 + 1
+    engines = {
+        first_player: new_engine(first, board, first_player, seed),
+        3 - first_player: new_engine(second, board, 3 - first_player, seed + 1),
+    }
+    totals = {1: [0, 0.0, 0], 2: [0, 0.0, 0]}  # moves, seconds, nodes
+    player = first_player
+    winner = 0
+    while not board.is_full():
+        engine = engines[player]
+        board.accept_move(engine.move(), player)
+        stats = engine.stats()
+        totals[player][0] += 1
+        totals[player][1] += stats.turn_duration
+        totals[player][2] += stats.nodes_explored
+        if board.check_win(player):
+            winner = player
+            break
+        player = 3 - player
+    for engine in engines.values():
+        if hasattr(engine, "close"):
+            engine.close()
+    return {
+        "first": first,
+        "second": second,
+        "first_player": first_player,
+        "winner": winner,
+        "moves": "".join(str(col + 1) for col in board.moves()),
+        "stats": {
+            str(player): {
+                "moves": moves,
+                "seconds": seconds,
+                "nodes": nodes,
+            }
+            for player, (moves, seconds, nodes) in totals.items()
+        },
+    }
+
+
+class ArenaReport:
+    """Running tally of games between engine A and engine B, from A's point of view"""
+
+    def __init__(self, engine_a: str, engine_b: str) -> None:
+        self.engines = (engine_a, engine_b)
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        # per engine: moves, seconds, nodes
+        self.__totals = {engine_a: [0, 0.0, 0], engine_b: [0, 0.0, 0]}
+
+    def add(self, game: dict, a_first: bool):
+        a_player = game["first_player"] if a_first else 3 - game["first_player"]
+        if game["winner"] == 0:
+            self.draws += 1
+        elif game["winner"] == a_player:
+            self.wins += 1
+        else:
+            self.losses += 1
+        for player, engine in (
+            (a_player, self.engines[0]),
+            (3 - a_player, self.engines[1]),
+        ):
+            stats = game["stats"][str(player)]
+            totals = self.__totals[engine]
+            totals[0] += stats["moves"]
+            totals[1] += stats["seconds"]
+            totals[2] += stats["nodes"]
+
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.games()
+
+    def score_interval(self, z: float = 1.96) -> tuple[float, float]:
+        """Normal-approximation confidence interval for A's score (95% by default)"""
+        n = self.games()
+        mean = self.score()
+        variance = (self.wins + self.draws / 4) / n - mean * mean
+        margin = z * math.sqrt(max(variance, 0) / n)
+        return max(0.0, mean - margin), min(1.0, mean + margin)
+
+    def per_move(self, engine: str) -> tuple[float, float]:
+        """Average seconds and nodes per move for an engine"""
+        moves, seconds, nodes = self.__totals[engine]
+        if moves == 0:
+            return 0.0, 0.0
+        return seconds / moves, nodes / moves
+
+    def summary(self) -> str:
+        low, high = self.score_interval()
+        lines = [
+            f"{self.engines[0]} vs {self.engines[1]}: +{self.wins} ={self.draws} -{self.losses}"
+            f" ({self.games()} games)",
+            f"score {self.score():.3f} (95% CI {low:.3f}-{high:.3f}),"
+            f" Elo {elo(self.score()):+.0f} ({elo(low):+.0f} to {elo(high):+.0f})",
+        ]
+        for engine in self.engines:
+            seconds, nodes = self.per_move(engine)
+            lines.append(
+                f"{engine}: {seconds * 1000:.1f} ms and {nodes:.0f} nodes per move"
+            )
+        return "\n".join(lines)
+
+
+def elo(score: float) -> float:
+    """Elo difference implied by an expected score, clamped so 0 and 1 stay finite"""
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / score - 1)
+
+
+def run_arena(
+    engine_a: str,
+    engine_b: str,
+    games: int,
+    workers: int,
+    opening_plies: int,
+    seed: int,
+    output: str | None = None,
+) -> ArenaReport:
+    for spec in (engine_a, engine_b):
+        parse_spec(spec)
+    report = ArenaReport(engine_a, engine_b)
+    record = open(output, "a", encoding="utf-8") if output else None
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {}
+        for game in range(games):
+            # each pair of games shares an opening, with colors swapped
+            a_first = game % 2 == 0
+            game_seed = seed + game // 2 * 2
+            first, second = (engine_a, engine_b) if a_first else (engine_b, engine_a)
+            future = pool.submit(play_game, first, second, opening_plies, game_seed)
+            futures[future] = a_first
+        for future in as_completed(futures):
+            result = future.result()
+            report.add(result, futures[future])
+            if result["winner"] == 0:
+                outcome = "draw"
+            elif result["winner"] == result["first_player"]:
+                outcome = "first wins"
+            else:
+                outcome = "second wins"
+            if record is not None:
+                record.write(json.dumps(result) + "\n")
+                record.flush()
+            print(
+                f"[{report.games()}/{games}] {result['first']} vs {result['second']}:"
+                f" {outcome} ({result['moves']}); A score {report.score():.3f}"
+            )
+    if record is not None:
+        record.close()
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("engine_a")
+    parser.add_argument("engine_b")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--opening-plies", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="append every game to this JSONL file")
+    args = parser.parse_args(argv)
+    report = run_arena(
+        args.engine_a,
+        args.engine_b,
+        args.games,
+        args.workers,
+        args.opening_plies,
+        args.seed,
+        args.output,
+    )
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,320 @@
+"""Search benchmarks.
+
+python bench.py suite --depth 6 --output after.json
+python bench.py compare before.json after.json --threshold 0.1
+python bench.py parallel --depth 9 --workers 1 2 4 8
+python bench.py memory --depth 6
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from board import new_board_from_moves, parse_move_string
+from cpu_player import GameState, new_cpu_player
+from instrumentation import RingBufferSink, Tracer
+
+PARALLEL_POSITIONS = ["4453", "3344", "3246117513", "515211441215", "41751266515541"]
+"""Move strings searched by the parallel benchmark: unfinished positions with
+player 1 to move, each needing around a second of search at the default depth"""
+MIN_COMPARED_SECONDS = 0.01
+"""Positions searched faster than this in the baseline are too noisy to flag individually"""
+CORPUS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "bench_positions.txt"
+)
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list[tuple[str, str, list[int]]]:
+    """Reads (category, move string, expected best moves as 0-based columns) from the corpus file"""
+    positions = []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            category, moves, expected = line.split()
+            positions.append(
+                (
+                    category,
+                    "" if moves == "-" else moves,
+                    [] if expected == "-" else parse_move_string(expected),
+                )
+            )
+    return positions
+
+
+def search_position(moves: str, depth: int, bitboard: bool) -> dict:
+    """Searches one position with a cold engine, deepening one ply at a time up to `depth`"""
+    played = parse_move_string(moves)
+    board = new_board_from_moves(played, bitboard=bitboard)
+    player_no = len(played) % 2 + 1
+    sink = RingBufferSink()
+    # measure the heuristic search, not the endgame solver
+    ai = new_cpu_player(
+        board, player_no, 3 - player_no, tracer=Tracer(sink), endgame_threshold=0
+    )
+    ai.time_budget = float("inf")
+    ai.max_depth = depth
+    move = ai.move()
+    stats = ai.stats()
+    elapsed = 0.0
+    time_to_depth = []
+    for seconds in stats.iteration_times:
+        elapsed += seconds
+        time_to_depth.append(elapsed)
+    iteration_moves = [
+        event["move"] for event in sink.events() if event["event"] == "iteration"
+    ]
+    if stats.forced:
+        # the tactical pre-pass answered without searching at all
+        iteration_moves = [move]
+        stats.iteration_nodes = [0]
+    return {
+        "move": move,
+        "seconds": stats.turn_duration,
+        "nodes": stats.nodes_explored,
+        "time_to_depth": time_to_depth,
+        "iteration_nodes": stats.iteration_nodes,
+        "iteration_moves": iteration_moves,
+    }
+
+
+def nodes_to_solution(result: dict, expected: list[int]) -> int | None:
+    """Nodes searched by the end of the first iteration after which the best move
+    stayed one of the expected moves, or None if the final move isn't one of them"""
+    solved_at = None
+    for nodes, move in zip(result["iteration_nodes"], result["iteration_moves"]):
+        if move in expected:
+            if solved_at is None:
+                solved_at = nodes
+        else:
+            solved_at = None
+    return solved_at
+
+
+def run_suite(depth: int, bitboard: bool, repeat: int, corpus: str) -> dict:
+    positions = []
+    for category, moves, expected in load_corpus(corpus):
+        # keep the fastest run, which is the one least disturbed by the rest of the system
+        result = min(
+            (search_position(moves, depth, bitboard) for _ in range(repeat)),
+            key=lambda run: run["seconds"],
+        )
+        entry = {
+            "category": category,
+            "moves": moves,
+            "expected": [col + 1 for col in expected],
+            "move": result["move"] + 1,
+            "seconds": result["seconds"],
+            "nodes": result["nodes"],
+            "nodes_per_second": result["nodes"] / result["seconds"],
+            "time_to_depth": result["time_to_depth"],
+            "agrees": result["move"] in expected if expected else None,
+            "nodes_to_solution": (
+                nodes_to_solution(result, expected) if expected else None
+            ),
+        }
+        positions.append(entry)
+        print(
+            f"{category:>8} {moves or '-':<34} move {entry['move']}"
+            f" {entry['seconds']:8.3f}s {entry['nodes']:>9} nodes"
+        )
+    total_seconds = sum(entry["seconds"] for entry in positions)
+    total_nodes = sum(entry["nodes"] for entry in positions)
+    judged = [entry for entry in positions if entry["agrees"] is not None]
+    solved = [entry["nodes_to_solution"] for entry in judged if entry["agrees"]]
+    return {
+        "meta": {
+            "depth": depth,
+            "bitboard": bitboard,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "summary": {
+            "seconds": total_seconds,
+            "nodes": total_nodes,
+            "nodes_per_second": total_nodes / total_seconds,
+            "agreement": sum(entry["agrees"] for entry in judged) / len(judged),
+            "mean_nodes_to_solution": sum(solved) / len(solved) if solved else None,
+        },
+        "positions": positions,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Returns a description of every regression beyond `threshold` (a fraction)"""
+    regressions = []
+    before, after = baseline["summary"], current["summary"]
+    if after["seconds"] > before["seconds"] * (1 + threshold):
+        regressions.append(
+            f"total time {before['seconds']:.3f}s -> {after['seconds']:.3f}s"
+        )
+    if after["nodes_per_second"] < before["nodes_per_second"] * (1 - threshold):
+        regressions.append(
+            f"nodes/s {before['nodes_per_second']:.0f} -> {after['nodes_per_second']:.0f}"
+        )
+    if after["agreement"] < before["agreement"]:
+        regressions.append(
+            f"best-move agreement {before['agreement']:.0%} -> {after['agreement']:.0%}"
+        )
+    previous = {entry["moves"]: entry for entry in baseline["positions"]}
+    for entry in current["positions"]:
+        old = previous.get(entry["moves"])
+        if old is None or old["seconds"] < MIN_COMPARED_SECONDS:
+            continue
+        if entry["seconds"] > old["seconds"] * (1 + threshold):
+            regressions.append(
+                f"{entry['category']} {entry['moves'] or '-'}:"
+                f" {old['seconds']:.3f}s -> {entry['seconds']:.3f}s"
+            )
+    return regressions
+
+
+def run_parallel(depth: int, worker_counts: list[int], bitboard: bool) -> None:
+    """Searches each position once per worker count and prints the speedup over the
+    first count. Each count gets one engine, reused for every position, which
+    searches a warm-up position first so starting its pool isn't timed."""
+    print(f"{'workers':>8} {'seconds':>9} {'nodes':>10} {'nodes/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        elapsed = 0.0
+        nodes = 0
+        board = new_board_from_moves([], bitboard=bitboard)
+        ai = new_cpu_player(board, 1, 2, workers=workers, endgame_threshold=0)
+        try:
+            ai.depth = 3
+            ai.move()
+            ai.depth = depth
+            for position in PARALLEL_POSITIONS:
+                while board.undo_move():
+                    pass
+                for turn, col in enumerate(parse_move_string(position)):
+                    board.accept_move(col, turn % 2 + 1)
+                ai.tt.clear()
+                ai.move()
+                elapsed += ai.stats().turn_duration
+                nodes += ai.stats().nodes_explored
+        finally:
+            ai.close()
+        if baseline is None:
+            baseline = elapsed
+        print(
+            f"{workers:>8} {elapsed:>9.3f} {nodes:>10} {nodes / elapsed:>10.0f} {baseline / elapsed:>7.2f}x"
+        )
+
+
+def node_size(node: object) -> int:
+    """Bytes held by one search node, including its attribute dict if it has one"""
+    size = sys.getsizeof(node)
+    if hasattr(node, "__dict__"):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+
+def run_memory(depth: int, bitboard: bool, corpus: str) -> dict:
+    """Searches each corpus position to `depth` under tracemalloc and reports the
+    peak memory the search allocated on top of the engine's own tables"""
+    positions = []
+    for category, moves, _ in load_corpus(corpus):
+        played = parse_move_string(moves)
+        board = new_board_from_moves(played, bitboard=bitboard)
+        player_no = len(played) % 2 + 1
+        ai = new_cpu_player(board, player_no, 3 - player_no, endgame_threshold=0)
+        ai.depth = depth
+        tracemalloc.start()
+        try:
+            ai.move()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        nodes = ai.stats().nodes_explored
+        positions.append(
+            {"category": category, "moves": moves, "nodes": nodes, "peak_bytes": peak}
+        )
+        print(
+            f"{category:>8} {moves or '-':<34} {peak / 1024:9.1f} KiB peak {nodes:>9} nodes"
+        )
+    node = GameState(new_board_from_moves([], bitboard=bitboard), 1, 0)
+    return {
+        "node_bytes": node_size(node),
+        "max_peak_bytes": max(entry["peak_bytes"] for entry in positions),
+        "peak_bytes_per_node": sum(entry["peak_bytes"] for entry in positions)
+        / sum(entry["nodes"] for entry in positions),
+        "positions": positions,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    suite = commands.add_parser("suite", help="search the position corpus")
+    suite.add_argument("--depth", type=int, default=6)
+    suite.add_argument("--repeat", type=int, default=1)
+    suite.add_argument("--bitboard", action="store_true")
+    suite.add_argument("--corpus", default=CORPUS_PATH)
+    suite.add_argument("--output", help="write the results to this JSON file")
+    compare = commands.add_parser(
+        "compare", help="flag regressions between two suite results"
+    )
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed slowdown, e.g. 0.1 for 10%%",
+    )
+    parallel = commands.add_parser(
+        "parallel", help="compare root-parallel search across worker counts"
+    )
+    parallel.add_argument("--depth", type=int, default=9)
+    parallel.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parallel.add_argument("--bitboard", action="store_true")
+    memory = commands.add_parser(
+        "memory", help="measure peak memory of the search with tracemalloc"
+    )
+    memory.add_argument("--depth", type=int, default=6)
+    memory.add_argument("--bitboard", action="store_true")
+    memory.add_argument("--corpus", default=CORPUS_PATH)
+    args = parser.parse_args(argv)
+    if args.command == "suite":
+        results = run_suite(args.depth, args.bitboard, args.repeat, args.corpus)
+        summary = results["summary"]
+        print(
+            f"{summary['seconds']:.3f}s, {summary['nodes']} nodes,"
+            f" {summary['nodes_per_second']:.0f} nodes/s,"
+            f" {summary['agreement']:.0%} best-move agreement"
+        )
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output:
+                json.dump(results, output, indent=2)
+    elif args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        with open(args.current, encoding="utf-8") as current_file:
+            current = json.load(current_file)
+        regressions = compare_results(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print("No regressions")
+    elif args.command == "parallel":
+        run_parallel(args.depth, args.workers, args.bitboard)
+    else:
+        results = run_memory(args.depth, args.bitboard, args.corpus)
+        print(
+            f"{results['node_bytes']} bytes per node,"
+            f" {results['max_peak_bytes'] / 1024:.1f} KiB largest peak,"
+            f" {results['peak_bytes_per_node']:.1f} peak bytes per node searched"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
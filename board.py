@@ -1,18 +1,63 @@
 from domain import IBoard, PositionState
+from evaluation import WindowTracker
+from zobrist import zobrist_keys
 
 
-def new_board(width: int, height: int) -> IBoard:
-    return Board(width, height)
+def new_board(
+    width: int, height: int, bitboard: bool = False, win_length: int = 4
+) -> IBoard:
+    if bitboard:
+        return BitBoard(width, height, win_length)
+    return Board(width, height, win_length)
+
+
+def new_board_from_moves(
+    moves: list[int],
+    width: int = 7,
+    height: int = 6,
+    bitboard: bool = False,
+    win_length: int = 4,
+) -> IBoard:
+    """Builds a board by playing `moves` (0-based columns) alternately, player 1 first"""
+    board = new_board(width, height, bitboard, win_length)
+    for turn, col in enumerate(moves):
+        if not board.accept_move(col, turn % 2 + 1):
+            raise ValueError(f"Column {col + 1} is full at move {turn + 1}")
+    return board
+
+
+def parse_move_string(move_string: str) -> list[int]:
+    """Converts a move string of 1-based columns into 0-based columns. Columns are
+    single digits, e.g. "4453", unless the string holds spaces or commas, in which
+    case they are the numbers between them, e.g. "12 4 10"."""
+    move_string = move_string.strip()
+    if " " in move_string or "," in move_string:
+        return [int(token) - 1 for token in move_string.replace(",", " ").split()]
+    return [int(char) - 1 for char in move_string]
+
+
+def to_move_string(moves: list[int]) -> str:
+    """Digits when every column fits in one, otherwise space separated numbers"""
+    if all(col < 9 for col in moves):
+        return "".join(str(col + 1) for col in moves)
+    return " ".join(str(col + 1) for col in moves)
 
 
 class Board(IBoard):
-    def __init__(self, width=6, depth=7) -> None:
+    def __init__(self, width=6, depth=7, win_length=4) -> None:
         self.__width = width
         self.__depth = depth
+        self.__win_length = win_length
         self.__states_grid: list[list[int]] = [
             [PositionState.PosEmpty.value for pos in range(width)] for _ in range(depth)
         ]
         self.__last_added: tuple[int, int] = (-1, -1)
+        self.__history: list[tuple[int, int]] = []
+        self.__zobrist = zobrist_keys(depth, width)
+        self.__hash = 0
+        # Bitboards in BitBoard's layout, kept alongside the grid for the evaluator
+        self.__pieces = [0, 0, 0]
+        self.__windows = WindowTracker(depth, width, win_length)
 
     def columns(self) -> int:
         return self.__width
@@ -20,9 +65,15 @@ class Board(IBoard):
     def rows(self) -> int:
         return self.__depth
 
+    def win_length(self) -> int:
+        return self.__win_length
+
     def last_added(self) -> tuple[int, int]:
         return self.__last_added
 
+    def moves(self) -> list[int]:
+        return [col for _, col in self.__history]
+
     def accept_move(self, col: int, player: int) -> bool:
         """This will return false if the board is full in that column, true otherwise, and will modify its state accordingly."""
         if self.__states_grid[0][col] != PositionState.PosEmpty.value:
@@ -31,11 +82,29 @@ class Board(IBoard):
             if self.__states_grid[row - 1][col] == PositionState.PosEmpty.value:
                 self.__states_grid[row - 1][col] = player
                 self.__last_added = (row - 1, col)
+                self.__hash ^= self.__zobrist.key(player, row - 1, col)
+                bit = self.__bit_index(row - 1, col)
+                self.__pieces[player] |= 1 << bit
+                self.__windows.add(player, bit)
+                self.__history.append(self.__last_added)
                 return True
         raise Exception(
             "This should never happen. If the column is full, the first row should have been checked."
         )
 
+    def undo_move(self) -> bool:
+        if not self.__history:
+            return False
+        row, col = self.__history.pop()
+        player = self.__states_grid[row][col]
+        self.__hash ^= self.__zobrist.key(player, row, col)
+        bit = self.__bit_index(row, col)
+        self.__pieces[player] &= ~(1 << bit)
+        self.__windows.remove(player, bit)
+        self.__states_grid[row][col] = PositionState.PosEmpty.value
+        self.__last_added = self.__history[-1] if self.__history else (-1, -1)
+        return True
+
     def state(self, row: int, col: int) -> int:
         return self.__states_grid[row][col]
 
@@ -43,43 +112,174 @@ class Board(IBoard):
         return self.__states_grid
 
     def check_win(self, player: int) -> bool:
-        for row in range(self.__depth):
-            for col in range(self.__width):
-                if self.__states_grid[row][col] == player:
-                    if self.__check_win_horizontal(row, col, player):
-                        return True
-                    if self.__check_win_vertical(row, col, player):
-                        return True
-                    if self.__check_win_diagonal_down(row, col, player):
-                        return True
-                    if self.__check_win_diagonal_up(row, col, player):
-                        return True
-        return False
+        """Only the lines through each new piece are examined as it is played (see
+        WindowTracker), so this is a lookup of the completed line count"""
+        return self.__windows.wins[player] > 0
 
     def is_full(self) -> bool:
-        return all(all(cell != 0 for cell in row) for row in self.states_grid())
+        return self.__windows.pieces == self.__width * self.__depth
 
-    def __check_win_horizontal(self, row: int, col: int, player: int) -> bool:
-        if col + 3 >= self.__width:
-            return False
-        return all(self.__states_grid[row][col + i] == player for i in range(4))
+    def key(self) -> int:
+        """Same encoding as BitBoard.key(), so keys are interchangeable between the two"""
+        return self.__pieces[PositionState.Player1.value] + (
+            self.__pieces[PositionState.Player1.value]
+            | self.__pieces[PositionState.Player2.value]
+        )
 
-    def __check_win_vertical(self, row: int, col: int, player: int) -> bool:
-        if row + 3 >= self.__depth:
-            return False
-        return all(self.__states_grid[row + i][col] == player for i in range(4))
+    def zobrist_hash(self) -> int:
+        return self.__hash
+
+    def pieces(self, player: int) -> int:
+        return self.__pieces[player]
+
+    def open_windows(self, player: int) -> list[int]:
+        return self.__windows.open_windows[player]
+
+    def piece_count(self) -> int:
+        return self.__windows.pieces
+
+    def __bit_index(self, row: int, col: int) -> int:
+        return col * (self.__depth + 1) + self.__depth - 1 - row
+
+
+class BitBoard(IBoard):
+    """Board storing each player's pieces as an integer bitboard.
+
+    Bits are laid out column by column starting at the bottom-left cell, with
+    `depth + 1` bits per column. The spare top bit of each column is never set,
+    so shifting a bitboard can't carry a line over from one column into the next.
+    """
+
+    def __init__(self, width=7, depth=6, win_length=4) -> None:
+        self.__width = width
+        self.__depth = depth
+        self.__win_length = win_length
+        self.__col_bits = depth + 1
+        # vertical, horizontal, and the two diagonals
+        self.__shifts = (1, self.__col_bits, self.__col_bits - 1, self.__col_bits + 1)
+        self.__pieces = [0, 0, 0]  # indexed by player number, slot 0 unused
+        self.__heights = [0 for _ in range(width)]
+        self.__last_added: tuple[int, int] = (-1, -1)
+        self.__history: list[int] = []
+        self.__zobrist = zobrist_keys(depth, width)
+        self.__hash = 0
+        self.__windows = WindowTracker(depth, width, win_length)
+        self.__bottom_mask = sum(1 << (col * self.__col_bits) for col in range(width))
+        self.__board_mask = self.__bottom_mask * ((1 << depth) - 1)
+
+    def columns(self) -> int:
+        return self.__width
+
+    def rows(self) -> int:
+        return self.__depth
+
+    def win_length(self) -> int:
+        return self.__win_length
+
+    def last_added(self) -> tuple[int, int]:
+        return self.__last_added
 
-    def __check_win_diagonal_down(self, row: int, col: int, player: int) -> bool:
-        if row + 3 >= self.__depth or col + 3 >= self.__width:
+    def moves(self) -> list[int]:
+        return list(self.__history)
+
+    def accept_move(self, col: int, player: int) -> bool:
+        """This will return false if the board is full in that column, true otherwise, and will modify its state accordingly."""
+        height = self.__heights[col]
+        if height == self.__depth:
             return False
-        return all(self.__states_grid[row + i][col + i] == player for i in range(4))
+        self.__pieces[player] |= 1 << (col * self.__col_bits + height)
+        self.__windows.add(player, col * self.__col_bits + height)
+        self.__heights[col] = height + 1
+        self.__last_added = (self.__depth - 1 - height, col)
+        self.__history.append(col)
+        self.__hash ^= self.__zobrist.key(player, self.__depth - 1 - height, col)
+        return True
 
-    def __check_win_diagonal_up(self, row: int, col: int, player: int) -> bool:
-        if row + 3 >= self.__depth or col - 3 < 0:
+    def undo_move(self) -> bool:
+        if not self.__history:
             return False
-        return all(
-            self.__states_grid[row + i][col - i] == player
-            for i in range(
-                4,
-            )
+        col = self.__history.pop()
+        height = self.__heights[col] - 1
+        bit = 1 << (col * self.__col_bits + height)
+        player = (
+            PositionState.Player1.value
+            if self.__pieces[PositionState.Player1.value] & bit
+            else PositionState.Player2.value
         )
+        self.__hash ^= self.__zobrist.key(player, self.__depth - 1 - height, col)
+        self.__pieces[player] &= ~bit
+        self.__windows.remove(player, col * self.__col_bits + height)
+        self.__heights[col] = height
+        if self.__history:
+            prev = self.__history[-1]
+            self.__last_added = (self.__depth - self.__heights[prev], prev)
+        else:
+            self.__last_added = (-1, -1)
+        return True
+
+    def state(self, row: int, col: int) -> int:
+        bit = 1 << (col * self.__col_bits + self.__depth - 1 - row)
+        if self.__pieces[PositionState.Player1.value] & bit:
+            return PositionState.Player1.value
+        if self.__pieces[PositionState.Player2.value] & bit:
+            return PositionState.Player2.value
+        return PositionState.PosEmpty.value
+
+    def states_grid(self) -> list[list[int]]:
+        """Builds the list-of-lists view expected by the renderers"""
+        return [
+            [self.state(row, col) for col in range(self.__width)]
+            for row in range(self.__depth)
+        ]
+
+    def check_win(self, player: int) -> bool:
+        pieces = self.__pieces[player]
+        for shift in self.__shifts:
+            # `run` marks the cells that start `length` pieces in a row, and
+            # doubles `length` with each step
+            run, length = pieces, 1
+            while 2 * length <= self.__win_length:
+                run &= run >> (length * shift)
+                length *= 2
+            if length < self.__win_length:
+                run &= run >> ((self.__win_length - length) * shift)
+            if run:
+                return True
+        return False
+
+    def is_full(self) -> bool:
+        return self.mask() == self.__board_mask
+
+    def key(self) -> int:
+        """Player 1's pieces plus the occupancy mask, which is unique per position"""
+        return self.__pieces[PositionState.Player1.value] + self.mask()
+
+    def zobrist_hash(self) -> int:
+        return self.__hash
+
+    def mask(self) -> int:
+        """Bitboard of every occupied cell"""
+        return (
+            self.__pieces[PositionState.Player1.value]
+            | self.__pieces[PositionState.Player2.value]
+        )
+
+    def pieces(self, player: int) -> int:
+        return self.__pieces[player]
+
+    def open_windows(self, player: int) -> list[int]:
+        return self.__windows.open_windows[player]
+
+    def piece_count(self) -> int:
+        return self.__windows.pieces
+
+    def playable_mask(self) -> int:
+        """Bitboard with the next free cell of every column that isn't full"""
+        return (self.mask() + self.__bottom_mask) & self.__board_mask
+
+    def can_play(self, col: int) -> bool:
+        return self.__heights[col] < self.__depth
+
+    def height(self, col: int) -> int:
+        """Number of pieces in col"""
+        return self.__heights[col]
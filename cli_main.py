@@ -1,16 +1,30 @@
+"""Play Connect 4 in the terminal, or analyse positions in bulk.
+
+python cli_main.py --rows 6 --columns 7
+python cli_main.py analyze positions.txt --depth 6 --output results.jsonl
+cat positions.txt | python cli_main.py analyze --time-budget 0.5
+"""
+
+import argparse
+import json
 import os
+import sys
+from analysis import analyze_positions
+from board import to_move_string
 from game import new_game
 
 
-if __name__ == "__main__":
-
-    game = new_game()
+def play(args):
+    game = new_game(args.rows, args.columns, args.connect, args.cache, args.record)
     player = game.current_player()
     while True:
         game.render_CLI()
         col = game.get_player_input(player)
         # os.system("clear")
-        if game.board().accept_move(col, player):
+        if game.play_move(col, player):
+            if player == 2 and not game.p2_human:
+                line = to_move_string(game.stats().principal_variation)
+                print(f"CPU played {col + 1}, expecting {line}")
             if game.board().check_win(player):
                 game.render_CLI()
                 print(f"Player {player} wins!")
@@ -21,3 +35,60 @@ if __name__ == "__main__":
                 break
         else:
             print("Move not acceptable!")
+
+
+def analyze(args):
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        results = analyze_positions(
+            source,
+            args.depth,
+            args.time_budget,
+            args.workers,
+            args.rows,
+            args.columns,
+            args.connect,
+        )
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Connect 4 in the terminal")
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--columns", type=int, default=7)
+    parser.add_argument("--connect", type=int, default=4, help="pieces in a row to win")
+    parser.add_argument("--cache", help="persistent position cache file to use")
+    parser.add_argument("--record", help="game record file to append the game to")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("play", help="play a game (the default)")
+    batch = commands.add_parser(
+        "analyze", help="search positions and write the results as JSON lines"
+    )
+    batch.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="file of move strings, one per line; - for stdin",
+    )
+    batch.add_argument("--depth", type=int, help="fixed search depth")
+    batch.add_argument(
+        "--time-budget",
+        type=float,
+        help="search seconds per position, instead of a fixed depth",
+    )
+    batch.add_argument("--workers", type=int, default=None)
+    batch.add_argument("--output", help="defaults to standard output")
+    args = parser.parse_args()
+
+    if args.command == "analyze":
+        analyze(args)
+    else:
+        play(args)
@@ -1,21 +1,47 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from contextlib import closing
+import copy
 from enum import Enum
 import math
-import random
+import multiprocessing
+import threading
 import time
-from domain import IBoard, LogEntry
-import copy
+from typing import TYPE_CHECKING, Callable, Generator
+from board import BitBoard, new_board_from_moves
+from domain import IBoard, IMoveOrderer, LogEntry
+from evaluation import EvalWeights, Evaluator
+from instrumentation import TraceLevel, Tracer
+from move_ordering import new_move_orderer
+from solver import Solver
+from tactics import analyze_tactics, good_threat_counts, parity_balance
+from transposition import Bound, ReplacementPolicy, TranspositionTable
+
+if TYPE_CHECKING:
+    from opening_book import OpeningBook
+    from position_cache import PositionCache
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget for the current move runs out"""
+
+
+class SearchCancelled(Exception):
+    """Raised inside the search when cancel() is called from another thread"""
 
 
 class GameState:
+    """A search node. Nodes hold no children or scores: children come one at a time
+    from generate_children() and are dropped as soon as the search moves on."""
+
+    __slots__ = ("move", "board", "_curr_player")
+
     def __init__(self, board, curr_player: int, move: int) -> None:
         self.move = move
         """The move (column) that led to this state"""
         self.board: IBoard = board
         self._curr_player = curr_player
-        self._children: list[GameState] = []
-        self._score = None
 
     def is_terminal(self):
         """Check if this state is a terminal state (win, loss, or draw)."""
@@ -23,15 +49,22 @@ class GameState:
             self.board.check_win(1) or self.board.check_win(2) or self.board.is_full()
         )
 
-    def generate_children(self) -> list[GameState]:
-        children: list[GameState] = []
+    def generate_children(
+        self, moves: list[int] | None = None
+    ) -> Generator[GameState, None, None]:
+        """Yields one child per legal move, or per entry of `moves` in that order. All
+        children share this state's board: the move is played before the child is
+        yielded and taken back when the generator resumes or is closed, so a child
+        is only valid until the next one."""
         next_player = 3 - self._curr_player
-        for move in possible_moves(self.board):
-            board_copy = copy.deepcopy(self.board)
-            board_copy.accept_move(move, self._curr_player)
-            child_state = GameState(board_copy, next_player, move)
-            children.append(child_state)
-        return children
+        if moves is None:
+            moves = possible_moves(self.board)
+        for move in moves:
+            self.board.accept_move(move, self._curr_player)
+            try:
+                yield GameState(self.board, next_player, move)
+            finally:
+                self.board.undo_move()
 
     def switch_players(self):
         if self._curr_player == 1:
@@ -40,114 +73,883 @@ class GameState:
             self._curr_player = 1
 
 
-def new_cpu_player(board: IBoard, player_no: int, opponent: int) -> AIPlayer:
-    return AIPlayer(board, player_no, opponent)
+def new_cpu_player(
+    board: IBoard,
+    player_no: int,
+    opponent: int,
+    tt_size: int = 1 << 16,
+    tt_policy: ReplacementPolicy = ReplacementPolicy.TwoTier,
+    time_budget: float | None = None,
+    move_orderer: IMoveOrderer | None = None,
+    workers: int = 1,
+    opening_book: OpeningBook | None = None,
+    eval_weights: EvalWeights | None = None,
+    tracer: Tracer | None = None,
+    endgame_threshold: int = 16,
+    position_cache: PositionCache | None = None,
+) -> AIPlayer:
+    return AIPlayer(
+        board,
+        player_no,
+        opponent,
+        tt_size,
+        tt_policy,
+        time_budget,
+        move_orderer,
+        workers,
+        opening_book,
+        eval_weights,
+        tracer,
+        endgame_threshold,
+        position_cache,
+    )
 
 
 class AIPlayer:
-    def __init__(self, board: IBoard, player_no: int, opponent: int) -> None:
+    def __init__(
+        self,
+        board: IBoard,
+        player_no: int,
+        opponent: int,
+        tt_size: int = 1 << 16,
+        tt_policy: ReplacementPolicy = ReplacementPolicy.TwoTier,
+        time_budget: float | None = None,
+        move_orderer: IMoveOrderer | None = None,
+        workers: int = 1,
+        opening_book: OpeningBook | None = None,
+        eval_weights: EvalWeights | None = None,
+        tracer: Tracer | None = None,
+        endgame_threshold: int = 16,
+        position_cache: PositionCache | None = None,
+    ) -> None:
         self.__board = board
         self.__player_no = player_no
         self.__opponent = opponent
         self.__curr_player = player_no
         self.depth = 3
+        self.time_budget = time_budget
+        """Seconds per move. When set, move() deepens one ply at a time until it runs out instead of searching to `depth`"""
+        self.max_depth: int | None = None
+        """Deepest iteration to run when searching with a time budget; None deepens until time runs out"""
+        self._deadline: float | None = None
+        self.__stop_move = threading.Event()
+        """Set by cancel() to stop the start_move() search"""
+        self.__stop_ponder = threading.Event()
+        """Set by stop_pondering() to stop the ponder search"""
+        self._stop = self.__stop_move
+        """The stop flag of whichever search is running, checked at every node. The
+        two are kept apart so stopping the ponder thread at the start of a
+        background move() can't clear a cancel() of that move."""
+        self._superseded: Callable[[], bool] | None = None
+        """Polled every 256 nodes; the search is cancelled once it returns True. Lets
+        a pool worker drop a child of a root search its engine has abandoned."""
+        self._searching = False
+        self._search_start: float = 0
+        self.__search_board: IBoard = board
+        self.__thread: threading.Thread | None = None
+        self.__background_result: int | None = None
+        self.__background_error: BaseException | None = None
+        """What stopped the last start_move() search, raised again by poll_move()"""
+        self.__ponder_thread: threading.Thread | None = None
+        self.__ponder_results: dict[int, tuple[int, int, float, list[int]]] = {}
+        """Position key after an opponent reply -> (depth searched, best move, score, principal variation)"""
+        self._ponder_nodes = 0
+        self._pondered = False
+        self.__last_move_stats: LogEntry | None = None
+        """What stats() reports while pondering, since the ponder search reuses the
+        counters that describe the last move"""
+        self._best_score: float = 0
+        """Score of the move returned by the last completed search, from this player's point of view"""
+        self._principal_variation: list[int] = []
+        """Moves the last completed search expects, starting with this player's move"""
+        self.aspiration_window: float = 25
+        """Half width of the window around the previous iteration's score that each
+        deeper iteration starts with; 0 always searches the full window"""
+        self._aspiration_researches = 0
+        self.opening_book = opening_book
+        self._from_book = False
+        self._forced = False
+        self._good_threats = (0, 0)
+        """Good threats held by this player and by the opponent after the last move"""
+        self.__root_tactics: tuple[int, list[int], dict[int, int]] | None = None
+        """Position key, moves worth searching and parity balance of the last root
+        searched, so deeper iterations don't work them out again"""
+        self.evaluator = Evaluator(eval_weights, board.win_length())
+        self._leaf_count = 0
+        self._tt_probes_at_start = 0
+        self.endgame_threshold = endgame_threshold
+        """move() solves the position exactly once this few empty cells remain, when
+        the solver supports the board (see Solver.supports); 0 never solves"""
+        self.__solver: Solver | None = None
+        self._solved = False
+        self._distance = 0
+        self.set_tracer(tracer)
+        self._depth_reached = 0
+        self._iteration_times: list[float] = []
+        self._iteration_nodes: list[int] = []
+        self.move_orderer = move_orderer or new_move_orderer(board.columns())
         self.players = [self.__opponent, self.__player_no]
         self._recurse_count = 0
         self._total_nodes_explored = 0
         self._time_elapsed: float = 0
+        self.tt = TranspositionTable(tt_size, tt_policy)
+        """Scores are stored from the point of view of the player to move in each position"""
+        self.__tt_config = (tt_size, tt_policy)
+        self.workers = workers
+        """Processes used to search root children in parallel; 1 searches in this process only"""
+        self.__pool: ProcessPoolExecutor | None = None
+        self.__shared_alpha = None
+        self.__search_generation = None
+        """Shared with the pool; bumped whenever a parallel root search starts or is
+        abandoned, so workers still on an older one stop and keep out of alpha"""
+        self.position_cache = position_cache
+        """Consulted on transposition table misses and updated after every move"""
+        if position_cache is not None:
+            self.warm_up()
+
+    def warm_up(self, count: int | None = None):
+        """Loads the `count` hottest positions from the position cache into the
+        transposition table, by default enough to fill half of it"""
+        if count is None:
+            count = self.tt.capacity() // 2
+        for entry in self.position_cache.hottest(count):
+            self.tt.store(
+                entry.key, entry.depth, entry.score, entry.bound, entry.best_move
+            )
+
+    def close(self):
+        """Shuts down the worker processes, if any were started"""
+        if self.__pool is not None:
+            self.__pool.shutdown(cancel_futures=True)
+            self.__pool = None
+
+    def set_tracer(self, tracer: Tracer | None):
+        """Enables tracing to `tracer`'s sink at its level, or disables it when None"""
+        self.tracer = tracer
+        self._trace_moves = tracer is not None and tracer.enabled(TraceLevel.Move)
+        self._trace_nodes = tracer is not None and tracer.enabled(TraceLevel.Node)
 
     def stats(self) -> LogEntry:
+        if self.__last_move_stats is not None:
+            return self.__last_move_stats
         return LogEntry(
-            self._recurse_count, self._total_nodes_explored, self._time_elapsed
+            self._recurse_count,
+            self._total_nodes_explored,
+            (
+                time.perf_counter() - self._search_start
+                if self._searching
+                else self._time_elapsed
+            ),
+            tt_hits=self.tt.hits,
+            tt_misses=self.tt.misses,
+            tt_evictions=self.tt.evictions,
+            tt_entries=len(self.tt),
+            depth_reached=self._depth_reached,
+            iteration_times=list(self._iteration_times),
+            iteration_nodes=list(self._iteration_nodes),
+            cutoffs=self.move_orderer.cutoffs,
+            first_move_cutoffs=self.move_orderer.first_move_cutoffs,
+            pondered=self._pondered,
+            ponder_nodes=self._ponder_nodes,
+            score=self._best_score,
+            from_book=self._from_book,
+            forced=self._forced,
+            good_threats=self._good_threats[0],
+            opponent_good_threats=self._good_threats[1],
+            leaf_evaluations=self._leaf_count,
+            tt_probes=self.tt.hits + self.tt.misses - self._tt_probes_at_start,
+            solved=self._solved,
+            distance=self._distance,
+            principal_variation=list(self._principal_variation),
+            aspiration_researches=self._aspiration_researches,
         )
 
     def move(self) -> int:
+        """Searches a private copy of the board, so the game's board can be read
+        (e.g. rendered) from another thread while the search runs."""
+        self.stop_pondering()
+        self._stop = self.__stop_move
+        self.__reset_counters()
+        self.__last_move_stats = None
         start = time.perf_counter()
-        best_move = random.choice(range(7))
-        best_score = -math.inf
-        game_state = GameState(self.__board, self.__curr_player, 0)
-        children = game_state.generate_children()
-        self._recurse_count = 0
-        for child in children:
-            score = self.minimax(child, self.depth, False, -math.inf, math.inf)
-            print("move() score for child: ", score, "move: ", child.move)
-            if score > best_score:
-                print("Default score has been bested!")
-                best_score = score
-                best_move = child.move
-        print("move() best_move: ", best_move)
-        end = time.perf_counter()
-        self._time_elapsed = end - start
+        ponder_nodes = self._ponder_nodes
+        self._from_book = False
+        self._forced = False
+        self._solved = False
+        self._pondered = False
+        self._ponder_nodes = 0
+        if self.opening_book is not None:
+            book_entry = self.opening_book.lookup(self.__board)
+            if book_entry is not None:
+                self._from_book = True
+                self.__ponder_results = {}
+                self.__reset_counters()
+                self._best_score = book_entry[1]
+                self._principal_variation = [book_entry[0]]
+                self.__count_threats(copy.deepcopy(self.__board), book_entry[0])
+                self._time_elapsed = time.perf_counter() - start
+                return book_entry[0]
+        tactics = analyze_tactics(self.__board, self.__player_no)
+        if tactics.forced is not None:
+            return self.__play_forced(tactics.forced, start)
+        self._search_start = start
+        self._searching = True
+        self.__reset_counters()
+        self.__search_board = copy.deepcopy(self.__board)
+        if self._trace_moves:
+            self.tracer.emit(
+                "search_start",
+                player=self.__player_no,
+                moves=self.__board.moves(),
+                depth=self.depth,
+                time_budget=self.time_budget,
+            )
+        # keep only the pondered answer to the move the opponent actually made
+        pondered = self.__ponder_results.get(self.__board.key())
+        self.__ponder_results = {}
+        self._pondered = pondered is not None
+        self._ponder_nodes = ponder_nodes
+        empty_cells = (
+            self.__board.rows() * self.__board.columns() - self.__board.piece_count()
+        )
+        try:
+            if empty_cells <= self.endgame_threshold and Solver.supports(self.__board):
+                best_move = self.__solve()
+            elif self.time_budget is None:
+                if pondered is not None and pondered[0] >= self.depth:
+                    best_move = pondered[1]
+                    self._best_score, self._principal_variation = pondered[2:]
+                else:
+                    best_move = self.__search_root(self.depth, None)
+                self.__finish_iteration(self.depth, best_move, start)
+            elif pondered is not None:
+                self._depth_reached = pondered[0]
+                self._best_score, self._principal_variation = pondered[2:]
+                best_move = self.__iterative_deepening(
+                    start, start + self.time_budget, pondered[0], pondered[1]
+                )
+            else:
+                best_move = self.__iterative_deepening(start, start + self.time_budget)
+        finally:
+            self._searching = False
+            self._time_elapsed = time.perf_counter() - start
         self._total_nodes_explored += self._recurse_count
+        self.__count_threats(self.__search_board, best_move)
+        if self.position_cache is not None and not self._solved:
+            self.position_cache.store_many(self.tt.entries())
+        if self._trace_moves:
+            self.tracer.emit(
+                "search_end",
+                move=best_move,
+                score=self._best_score,
+                depth=self._depth_reached,
+                nodes=self._recurse_count,
+                seconds=self._time_elapsed,
+                pondered=self._pondered,
+                solved=self._solved,
+                principal_variation=self._principal_variation,
+                good_threats=self._good_threats,
+            )
         return best_move
 
-    def minimax(
+    def __count_threats(self, board: IBoard, move: int):
+        """Records the good threats each side holds once `move` is played on `board`,
+        which is left as it was"""
+        board.accept_move(move, self.__player_no)
+        try:
+            self._good_threats = good_threat_counts(board, self.__player_no)
+        finally:
+            board.undo_move()
+
+    def __play_forced(self, move: int, start: float) -> int:
+        """Plays a move the tactical pre-pass found to be the only sensible one,
+        scored by a static evaluation of the position it leads to"""
+        self._forced = True
+        self.__ponder_results = {}
+        self.__reset_counters()
+        self._depth_reached = 0
+        # on a copy, since the game's board may be read from another thread
+        board = copy.deepcopy(self.__board)
+        self.__count_threats(board, move)
+        board.accept_move(move, self.__player_no)
+        self._best_score = self.evaluator.evaluate(board, self.__player_no)
+        self._principal_variation = [move]
+        self._time_elapsed = time.perf_counter() - start
+        self._total_nodes_explored += self._recurse_count
+        if self._trace_moves:
+            self.tracer.emit("forced", move=move, score=self._best_score)
+        return move
+
+    def __solve(self) -> int:
+        """Plays the best move according to an exact solve of the position"""
+        if self.__solver is None:
+            self.__solver = Solver(self.__board.rows(), self.__board.columns())
+            self.__solver.check = self.__check_cancelled
+        result = self.__solver.solve(self.__search_board, self.__player_no)
+        self._recurse_count = result.nodes
+        self._best_score = result.score
+        self._distance = result.distance
+        self._principal_variation = [result.best_move]
+        self._depth_reached = (
+            self.__board.rows() * self.__board.columns() - self.__board.piece_count()
+        )
+        self._solved = True
+        return result.best_move
+
+    def __check_cancelled(self):
+        if self._stop.is_set():
+            raise SearchCancelled
+
+    def __reset_counters(self):
+        self._recurse_count = 0
+        self._leaf_count = 0
+        self._tt_probes_at_start = self.tt.hits + self.tt.misses
+        self._iteration_times = []
+        self._iteration_nodes = []
+        self._aspiration_researches = 0
+        self.move_orderer.new_search()
+
+    def __finish_iteration(self, depth: int, best_move: int, iteration_start: float):
+        seconds = time.perf_counter() - iteration_start
+        self._depth_reached = depth
+        self._iteration_times.append(seconds)
+        self._iteration_nodes.append(self._recurse_count)
+        if self._trace_moves:
+            self.tracer.emit(
+                "iteration",
+                depth=depth,
+                move=best_move,
+                score=self._best_score,
+                nodes=self._recurse_count,
+                seconds=seconds,
+                principal_variation=self._principal_variation,
+            )
+
+    def start_move(self):
+        """Runs move() on a background thread. Poll for the result with poll_move()."""
+        self.cancel()
+        self.__background_result = None
+        self.__background_error = None
+        self.__thread = threading.Thread(target=self.__background_move, daemon=True)
+        self.__thread.start()
+
+    def poll_move(self) -> int | None:
+        """Returns the move found by start_move() once the search has finished, None
+        until then. If the search failed, raises the exception that stopped it."""
+        if self.__thread is None or self.__thread.is_alive():
+            return None
+        self.__thread = None
+        if self.__background_error is not None:
+            error, self.__background_error = self.__background_error, None
+            raise error
+        return self.__background_result
+
+    def cancel(self):
+        """Stops a search started with start_move() and waits for its thread to exit"""
+        if self.__thread is None:
+            return
+        self.__stop_move.set()
+        self.__thread.join()
+        self.__thread = None
+        self.__stop_move.clear()
+
+    def __background_move(self):
+        try:
+            self.__background_result = self.move()
+        except SearchCancelled:
+            pass
+        except Exception as error:
+            # a dying thread would leave poll_move() returning None forever
+            self.__background_error = error
+
+    def start_pondering(self):
+        """Searches the opponent's likely replies on a background thread while they
+        think. Results are kept until the next move(), which answers straight
+        from them when the opponent played one of the pondered replies."""
+        self.stop_pondering()
+        if self.__last_move_stats is None:
+            self.__last_move_stats = self.stats()
+        # copy here, before the caller can play the human's move on the board
+        board = copy.deepcopy(self.__board)
+        self.__ponder_thread = threading.Thread(
+            target=self.__ponder, args=(board,), daemon=True
+        )
+        self.__ponder_thread.start()
+
+    def stop_pondering(self):
+        if self.__ponder_thread is None:
+            return
+        self.__stop_ponder.set()
+        self.__ponder_thread.join()
+        self.__ponder_thread = None
+        self.__stop_ponder.clear()
+
+    def __ponder(self, board: IBoard):
+        """Deepens one ply at a time over every reply, most likely first, so each
+        reply has a usable answer before any reply is searched deeply. `board` is a
+        private copy of the position before the opponent's reply."""
+        self._stop = self.__stop_ponder
+        self.__search_board = board
+        self.__reset_counters()
+        replies = self.move_orderer.order(
+            possible_moves(board), 0, self.__opponent, None
+        )
+        empty_cells = board.rows() * board.columns() - len(board.moves())
+        max_depth = self.depth if self.time_budget is None else empty_cells - 2
+        try:
+            for depth in range(max_depth + 1):
+                for reply in replies:
+                    board.accept_move(reply, self.__opponent)
+                    try:
+                        if board.check_win(self.__opponent) or board.is_full():
+                            continue
+                        best_move = self.__search_root(depth, None)
+                        self.__ponder_results[board.key()] = (
+                            depth,
+                            best_move,
+                            self._best_score,
+                            self._principal_variation,
+                        )
+                    finally:
+                        board.undo_move()
+        except SearchCancelled:
+            pass
+        finally:
+            self._ponder_nodes = self._recurse_count
+
+    def __iterative_deepening(
+        self,
+        start: float,
+        deadline: float,
+        first_depth: int = 0,
+        best_move: int | None = None,
+    ) -> int:
+        """Searches depth 0, 1, 2, ... until the deadline passes and returns the best
+        move of the deepest search that finished. The depth 0 search always runs to
+        completion so there is a move to return even with a tiny budget. When a
+        result for `first_depth` is already known, pass it as `best_move` to start
+        one ply deeper."""
+        board = self.__search_board
+        last_depth = board.rows() * board.columns() - len(board.moves()) - 1
+        if self.max_depth is not None:
+            last_depth = min(last_depth, self.max_depth)
+        if best_move is None:
+            best_move = self.__search_root(first_depth, None)
+            self.__finish_iteration(first_depth, best_move, start)
+        # a failed aspiration attempt leaves its bound and line behind, so keep the
+        # last completed iteration's to put back if time runs out before the re-search
+        completed = (self._best_score, self._principal_variation)
+        self._deadline = deadline
+        try:
+            for depth in range(first_depth + 1, last_depth + 1):
+                iteration_start = time.perf_counter()
+                best_move = self.__aspiration_search(depth, best_move)
+                self.__finish_iteration(depth, best_move, iteration_start)
+                completed = (self._best_score, self._principal_variation)
+        except SearchTimeout:
+            self._best_score, self._principal_variation = completed
+        finally:
+            self._deadline = None
+        return best_move
+
+    def __aspiration_search(self, depth: int, first_move: int) -> int:
+        """Searches a window of `aspiration_window` around the previous iteration's
+        score, widening the side that failed and searching again when the score
+        falls outside it"""
+        guess = self._best_score
+        if not self.aspiration_window or abs(guess) >= self.evaluator.weights.win:
+            return self.__search_root(depth, first_move)
+        alpha = guess - self.aspiration_window
+        beta = guess + self.aspiration_window
+        while True:
+            best_move = self.__search_root(depth, first_move, alpha, beta)
+            if self._best_score <= alpha:
+                alpha = -math.inf
+            elif self._best_score >= beta:
+                beta = math.inf
+            else:
+                return best_move
+            self._aspiration_researches += 1
+            first_move = best_move
+
+    def __search_root(
+        self,
+        depth: int,
+        first_move: int | None,
+        alpha: float = -math.inf,
+        beta: float = math.inf,
+    ) -> int:
+        """Scores the children of the current position with a search of `depth`
+        further plies, trying `first_move` first, and returns the best one. Only the
+        first child gets the full window (alpha, beta); the rest are tested with a
+        zero window and searched again only if they beat the best so far."""
+        board = self.__search_board
+        game_state = GameState(board, self.__curr_player, 0)
+        if self.__root_tactics is None or self.__root_tactics[0] != board.key():
+            candidates = analyze_tactics(board, self.__curr_player).moves
+            self.__root_tactics = (
+                board.key(),
+                candidates,
+                parity_balance(board, self.__curr_player, candidates),
+            )
+        _, candidates, balance = self.__root_tactics
+        # moves that lose at once are left out. After the best move so far, moves go
+        # by the zugzwang threat balance they leave (see tactics.py), and the
+        # heuristic order only breaks ties between equal balances
+        moves = sorted(
+            self.move_orderer.order(candidates, 0, self.__curr_player, first_move),
+            key=lambda move: (move != first_move, -balance[move]),
+        )
+        if self.workers > 1 and len(moves) > 1:
+            return self.__search_root_parallel(depth, moves, alpha, beta)
+        best_move = moves[0]
+        best_score = -math.inf
+        principal_variation = [best_move]
+        with closing(game_state.generate_children(moves)) as children:
+            for index, child in enumerate(children):
+                line = []
+                score = self.__search_child(child, depth, alpha, beta, 1, index, line)
+                if score > best_score:
+                    best_score = score
+                    best_move = child.move
+                    principal_variation = [child.move, *line]
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+        self._best_score = best_score
+        self._principal_variation = principal_variation
+        return best_move
+
+    def __search_root_parallel(
+        self, depth: int, moves: list[int], alpha: float, beta: float
+    ) -> int:
+        """Young Brothers Wait: the first (eldest) child is searched here to get a
+        lower bound for the root, then its siblings are searched by the worker pool
+        with that bound. Workers also publish every better score through shared
+        memory, so children started later begin with a narrower window."""
+        board = self.__search_board
+        game_state = GameState(board, self.__curr_player, 0)
+        line = []
+        with closing(game_state.generate_children(moves[:1])) as children:
+            for child in children:
+                best_score = self.__search_child(child, depth, alpha, beta, 1, 0, line)
+        best_move = moves[0]
+        principal_variation = [best_move, *line]
+        if best_score >= beta:
+            self._best_score = best_score
+            self._principal_variation = principal_variation
+            return best_move
+        pool = self.__ensure_pool()
+        generation = self.__new_generation(max(alpha, best_score))
+        config = (
+            board.rows(),
+            board.columns(),
+            board.win_length(),
+            isinstance(board, BitBoard),
+            self.__player_no,
+            self.__opponent,
+            *self.__tt_config,
+            (
+                self.evaluator.weights.two,
+                self.evaluator.weights.three,
+                self.evaluator.weights.win,
+            ),
+        )
+        played = board.moves()
+        time_left = (
+            None if self._deadline is None else self._deadline - time.perf_counter()
+        )
+        futures = [
+            pool.submit(
+                _search_root_child,
+                config,
+                played,
+                move,
+                depth,
+                max(alpha, best_score),
+                beta,
+                time_left,
+                generation,
+            )
+            for move in moves[1:]
+        ]
+        timed_out = False
+        try:
+            # results are read in move order so ties always resolve the same way
+            for move, future in zip(moves[1:], futures):
+                while True:
+                    if self._stop.is_set():
+                        raise SearchCancelled
+                    try:
+                        score, line, nodes = future.result(timeout=0.05)
+                        break
+                    except TimeoutError:
+                        pass
+                self._recurse_count += nodes
+                if score is None:
+                    timed_out = True
+                elif line is not None and score > best_score:
+                    best_score = score
+                    best_move = move
+                    principal_variation = [move, *line]
+        except BaseException:
+            # children already running would otherwise finish this search and
+            # publish its scores into the next one's alpha
+            self.__new_generation(-math.inf)
+            for pending in futures:
+                pending.cancel()
+            raise
+        if timed_out:
+            raise SearchTimeout
+        self._best_score = best_score
+        self._principal_variation = principal_variation
+        return best_move
+
+    def __ensure_pool(self) -> ProcessPoolExecutor:
+        if self.__pool is None:
+            self.__shared_alpha = multiprocessing.Value("d", -math.inf)
+            self.__search_generation = multiprocessing.Value("i", 0, lock=False)
+            self.__pool = ProcessPoolExecutor(
+                self.workers,
+                initializer=_init_search_worker,
+                initargs=(self.__shared_alpha, self.__search_generation),
+            )
+        return self.__pool
+
+    def __new_generation(self, alpha: float) -> int:
+        """Starts a new parallel root search with the shared alpha at `alpha` and
+        returns its generation"""
+        with self.__shared_alpha.get_lock():
+            self.__search_generation.value += 1
+            self.__shared_alpha.value = alpha
+            return self.__search_generation.value
+
+    def __search_child(
+        self,
+        child: GameState,
+        depth: int,
+        alpha: float,
+        beta: float,
+        ply: int,
+        index: int,
+        line: list[int],
+    ) -> float:
+        """Principal variation search of one child of a node searched with the window
+        (alpha, beta), returning its score from the parent's side. The eldest child
+        gets the full window. Its siblings are expected to be worse and only get a
+        zero window above alpha; one that fails high is searched again with the
+        window it proved. `line` receives the child's principal variation."""
+        if index == 0 or alpha == -math.inf:
+            return -self.negamax(child, depth, -beta, -alpha, ply, line)
+        # scores are whole numbers with integer weights, so (alpha, alpha + 1)
+        # holds no score and the search only proves a bound
+        score = -self.negamax(child, depth, -alpha - 1, -alpha, ply, line)
+        if alpha < score < beta:
+            if line is not None:
+                line.clear()
+            score = -self.negamax(child, depth, -beta, -score, ply, line)
+        return score
+
+    def negamax(
         self,
         game_state: GameState,
         depth: int,
-        maximizing_player: bool,
         alpha: float,
         beta: float,
-    ):
-        print("minimax() depth: ", depth)
+        ply: int = 1,
+        line: list[int] | None = None,
+    ) -> float:
+        """Score of `game_state` from the point of view of the player to move, found
+        with a principal variation search of `depth` plies. When given, `line` is
+        filled with the moves expected from here."""
         self._recurse_count += 1
-        print("Recurse count: ", self._recurse_count)
-        print("game_state.__curr_player: ", game_state._curr_player)
-        print("maximizing: ", maximizing_player)
-        print("game_state board: ")
-        for row in game_state.board.states_grid():
-            print(row)
-        max_eval = -math.inf
+        if self._stop.is_set():
+            raise SearchCancelled
+        if (
+            self._deadline is not None
+            and self._recurse_count & 255 == 0
+            and time.perf_counter() > self._deadline
+        ):
+            raise SearchTimeout
+        if (
+            self._superseded is not None
+            and self._recurse_count & 255 == 0
+            and self._superseded()
+        ):
+            raise SearchCancelled
+        player = game_state._curr_player
+        if self._trace_nodes:
+            self.tracer.emit(
+                "node",
+                ply=ply,
+                depth=depth,
+                player=player,
+                alpha=alpha,
+                beta=beta,
+                moves=game_state.board.moves(),
+            )
         if depth == 0 or game_state.is_terminal():
-            return self.evaluate_board(game_state.board)
-        if maximizing_player:
-            children = game_state.generate_children()
-            for child in children:
-                eval = self.minimax(child, depth - 1, False, alpha, beta)
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break  # Beta cut-off
-            return max_eval
+            self._leaf_count += 1
+            score = self.evaluator.evaluate(game_state.board, player)
+            if self._trace_nodes:
+                self.tracer.emit("leaf", ply=ply, score=score)
+            return score
+        key = game_state.board.zobrist_hash()
+        entry = self.tt.probe(key)
+        if entry is None and self.position_cache is not None:
+            entry = self.position_cache.probe(key)
+            if entry is not None:
+                self.tt.store(
+                    key, entry.depth, entry.score, entry.bound, entry.best_move
+                )
+        if entry is not None and entry.depth >= depth:
+            if entry.bound == Bound.Exact:
+                if line is not None:
+                    line.append(entry.best_move)
+                return entry.score
+            if entry.bound == Bound.Lower:
+                alpha = max(alpha, entry.score)
+            else:
+                beta = min(beta, entry.score)
+            if beta <= alpha:
+                return entry.score
+        alpha_orig = alpha
+        best_score = -math.inf
+        best_move = -1
+        moves = self.move_orderer.order(
+            possible_moves(game_state.board),
+            ply,
+            player,
+            entry.best_move if entry is not None else None,
+        )
+        with closing(game_state.generate_children(moves)) as children:
+            for index, child in enumerate(children):
+                child_line = [] if line is not None else None
+                score = self.__search_child(
+                    child, depth - 1, alpha, beta, ply + 1, index, child_line
+                )
+                if score > best_score:
+                    best_score = score
+                    best_move = child.move
+                    if line is not None:
+                        line[:] = [child.move, *child_line]
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    self.__record_cutoff(child.move, ply, depth, player, index)
+                    break
+        self.__store(key, depth, best_score, alpha_orig, beta, best_move)
+        return best_score
+
+    def __record_cutoff(self, move: int, ply: int, depth: int, player: int, index: int):
+        self.move_orderer.record_cutoff(move, ply, depth, player, index)
+        if self._trace_nodes:
+            self.tracer.emit("cutoff", ply=ply, depth=depth, move=move, index=index)
+
+    def __store(
+        self,
+        key: int,
+        depth: int,
+        score: float,
+        alpha: float,
+        beta: float,
+        best_move: int,
+    ):
+        """Records a search result along with whether it is exact or only a bound of the window (alpha, beta)"""
+        if score <= alpha:
+            bound = Bound.Upper
+        elif score >= beta:
+            bound = Bound.Lower
         else:
-            min_eval = math.inf
-            children = game_state.generate_children()
-            for child in children:
-                eval = self.minimax(child, depth - 1, True, alpha, beta)
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break  # Alpha cut-off
-            return min_eval
+            bound = Bound.Exact
+        self.tt.store(key, depth, score, bound, best_move)
 
     def evaluate_board(self, board: IBoard) -> float:
-        score = 0
-        close_to_four_self = self.close_to_four_count(self.__player_no, board)
-        close_to_four_opp = self.close_to_four_count(self.__opponent, board)
-        score += 5 * close_to_four_self
-        score -= 5 * close_to_four_opp
-        if board.check_win(self.__player_no):
-            score += 100
-        if board.check_win(self.__opponent):
-            score -= 100
-        print("score in evaluate_board(): ", score)
-        return score
+        return self.evaluator.evaluate(board, self.__player_no)
 
     def close_to_four_count(self, player: int, board: IBoard) -> int:
         """The number of times player has three in a row with a fourth space empty"""
-        count = 0
-        # Count horizontal instances
-        for row in range(board.rows()):
-            for col in range(board.columns() - 3):
-                if is_close_horiz(row, col, board, player):
-                    count += 1
-        # Check vertical using same function but passing columns as rows and vice versa
-        for col in range(board.columns()):
-            for row in range(board.rows() - 3):
-                if is_close_vert(row, col, board, player):
-                    count += 1
-        print("close_to_four_count: ", count)
-        return count
+        return self.evaluator.count_windows(board, player, 3)
+
+
+_worker_alpha = None
+"""Best root score found so far, shared by every process in the pool"""
+_worker_generation = None
+"""Generation of the root search `_worker_alpha` belongs to; written under its lock"""
+_worker_players: dict[tuple, AIPlayer] = {}
+"""One AIPlayer per configuration, kept for the life of the worker so its tables stay warm"""
+
+
+def _init_search_worker(shared_alpha, generation) -> None:
+    global _worker_alpha, _worker_generation
+    _worker_alpha = shared_alpha
+    _worker_generation = generation
+
+
+def _search_root_child(
+    config: tuple,
+    played: list[int],
+    move: int,
+    depth: int,
+    alpha: float,
+    beta: float,
+    time_left: float | None,
+    generation: int,
+) -> tuple[float | None, list[int] | None, int]:
+    """Runs in a pool worker. Searches the root child reached by playing `move` after
+    `played` and returns its score, or None if time ran out or the root search of
+    `generation` was abandoned, with the principal variation after `move` and the
+    node count. The line is None when the child only proved that it is no better
+    than alpha."""
+    (
+        rows,
+        cols,
+        win_length,
+        bitboard,
+        player_no,
+        opponent,
+        tt_size,
+        tt_policy,
+        weights,
+    ) = config
+    board = new_board_from_moves(played, cols, rows, bitboard, win_length)
+    player = _worker_players.get(config)
+    if player is None:
+        player = AIPlayer(
+            board,
+            player_no,
+            opponent,
+            tt_size,
+            tt_policy,
+            eval_weights=EvalWeights(*weights),
+        )
+        _worker_players[config] = player
+    player._recurse_count = 0
+    with _worker_alpha.get_lock():
+        if _worker_generation.value != generation:
+            return None, None, 0
+        alpha = max(alpha, _worker_alpha.value)
+    player._superseded = lambda: _worker_generation.value != generation
+    board.accept_move(move, player_no)
+    child = GameState(board, opponent, move)
+    line = []
+    if time_left is not None:
+        player._deadline = time.perf_counter() + time_left
+    try:
+        score = -player.negamax(child, depth, -alpha - 1, -alpha, 1, line)
+        if alpha < score < beta:
+            line.clear()
+            score = -player.negamax(child, depth, -beta, -score, 1, line)
+    except (SearchTimeout, SearchCancelled):
+        return None, None, player._recurse_count
+    finally:
+        player._deadline = None
+        player._superseded = None
+    if score <= alpha:
+        return score, None, player._recurse_count
+    with _worker_alpha.get_lock():
+        if _worker_generation.value == generation and score > _worker_alpha.value:
+            _worker_alpha.value = score
+    return score, line, player._recurse_count
 
 
 def possible_moves(board: IBoard) -> list[int]:
@@ -156,20 +958,3 @@ def possible_moves(board: IBoard) -> list[int]:
         if board.state(0, col) == 0:
             cols.append(col)
     return cols
-
-
-def is_close_horiz(row: int, col: int, board: IBoard, player: int) -> bool:
-    """Returns True if the count of `player` for a horizontal window of length 4 starting at `col` is 3 and count of 0 (empty) is 1"""
-    window = board.states_grid()[row][col : col + 4]
-    has_three_player = window.count(player) == 3
-    has_one_empty = window.count(0) == 1
-    return has_three_player and has_one_empty
-
-
-def is_close_vert(row: int, col: int, board: IBoard, player: int) -> bool:
-    """Returns True if the count of `player` for a vertical window of length 4 starting at `row` is 3 and count of 0(empty) is 1"""
-    column = [rw[col] for rw in board.states_grid()]
-    window = column[row : row + 4]
-    has_three_player = window.count(player) == 3
-    has_one_empty = window.count(0) == 1
-    return has_three_player and has_one_empty
@@ -0,0 +1,337 @@
+"""Self-play dataset of labeled positions for fitting the evaluation weights.
+
+    python dataset.py generate data/ --games 100000 --workers 8 --depth 4
+    python dataset.py info data/
+
+Games are played by two AIPlayers searching to a fixed depth after a few random
+opening moves, one game per worker task. Every searched position becomes one
+record:
+
+    planes     2 x ceil(rows * columns / 8) bytes: the side to move's pieces,
+               then the opponent's. Cell (row, col), rows counted from the
+               bottom, is bit `row * columns + col`, least significant bit first
+               (np.unpackbits(..., bitorder="little") restores the grid)
+    side       the player to move, 1 or 2
+    ply        pieces on the board
+    score      search score of the move played, for the side to move
+    solved     whether `score` came from the exact endgame solver instead
+    forced     whether the move was the only sensible one and was played without a
+               search, in which case `score` is a static evaluation of the result
+    outcome    1 if the side to move went on to win, -1 if it lost, 0 for a draw
+
+Records stream into `.npy` shards of `shard_size` records each, written straight
+to disk so memory stays flat however long the run. Each shard is a standard
+version 1.0 `.npy` file holding a structured array, so np.load(path,
+mmap_mode="r") maps it without reading it in. No numpy is needed to write them.
+
+manifest.json lists the finished shards with the run's settings. A shard is only
+added to it once complete, along with the game and ply the next shard starts at.
+Every game is seeded from its index and the search is deterministic, so running
+`generate` again on the same directory picks up after the last finished shard and
+writes the same records an uninterrupted run would have.
+"""
+
+from __future__ import annotations
+import argparse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import json
+import os
+import random
+import struct
+import sys
+import time
+from board import new_board
+from cpu_player import new_cpu_player, possible_moves
+from domain import IBoard
+
+MANIFEST = "manifest.json"
+VERSION = 2
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_HEADER_SIZE = 256
+"""Bytes before the data, fixed so the shape can be rewritten in place"""
+DEFAULT_SHARD_SIZE = 1 << 16
+
+
+def plane_bytes(rows: int, columns: int) -> int:
+    return (rows * columns + 7) // 8
+
+
+def record_format(rows: int, columns: int) -> struct.Struct:
+    """planes, side, ply, score, solved, forced, outcome"""
+    return struct.Struct(f"<{2 * plane_bytes(rows, columns)}sBHf??b")
+
+
+def record_descr(rows: int, columns: int) -> str:
+    """The numpy dtype matching record_format(), as written in the .npy header"""
+    return (
+        f"[('planes', '|u1', (2, {plane_bytes(rows, columns)})), ('side', '|u1'),"
+        " ('ply', '<u2'), ('score', '<f4'), ('solved', '|b1'), ('forced', '|b1'),"
+        " ('outcome', '|i1')]"
+    )
+
+
+def encode_planes(board: IBoard, player: int) -> bytes:
+    rows, columns = board.rows(), board.columns()
+    size = plane_bytes(rows, columns)
+    planes = b""
+    for side in (player, 3 - player):
+        pieces = board.pieces(side)
+        packed = 0
+        while pieces:
+            bit = pieces & -pieces
+            col, row = divmod(bit.bit_length() - 1, rows + 1)
+            packed |= 1 << (row * columns + col)
+            pieces ^= bit
+        planes += packed.to_bytes(size, "little")
+    return planes
+
+
+def play_game(config: dict, game: int) -> list[bytes]:
+    """Plays game number `game` and returns its records, one per searched position"""
+    rows, columns = config["rows"], config["columns"]
+    rng = random.Random(config["seed"] * 1_000_003 + game)
+    board = new_board(columns, rows, bitboard=True, win_length=config["connect"])
+    while board.piece_count() < config["opening_plies"]:
+        player = board.piece_count() % 2 + 1
+        board.accept_move(rng.choice(possible_moves(board)), player)
+        if board.check_win(player) or board.is_full():
+            # an opening that ends the game leaves nothing to search; draw another
+            while board.undo_move():
+                pass
+    engines = {}
+    for player in (1, 2):
+        engines[player] = new_cpu_player(
+            board, player, 3 - player, tt_size=config["tt_size"]
+        )
+        engines[player].depth = config["depth"]
+    positions = []
+    player = board.piece_count() % 2 + 1
+    winner = 0
+    while not board.is_full():
+        planes = encode_planes(board, player)
+        ply = board.piece_count()
+        move = engines[player].move()
+        stats = engines[player].stats()
+        positions.append((planes, player, ply, stats.score, stats.solved, stats.forced))
+        board.accept_move(move, player)
+        if board.check_win(player):
+            winner = player
+            break
+        player = 3 - player
+    for engine in engines.values():
+        engine.close()
+    record = record_format(rows, columns)
+    return [
+        record.pack(
+            planes,
+            side,
+            ply,
+            score,
+            solved,
+            forced,
+            0 if winner == 0 else 1 if winner == side else -1,
+        )
+        for planes, side, ply, score, solved, forced in positions
+    ]
+
+
+def npy_header(descr: str, count: int) -> bytes:
+    header = f"{{'descr': {descr}, 'fortran_order': False, 'shape': ({count},), }}"
+    padding = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError("record dtype too long for the .npy header")
+    return (
+        NPY_MAGIC
+        + struct.pack("<H", NPY_HEADER_SIZE - len(NPY_MAGIC) - 2)
+        + header.encode("latin1")
+        + b" " * padding
+        + b"\n"
+    )
+
+
+class ShardWriter:
+    """Writes records to numbered `.npy` shards and keeps the manifest up to date"""
+
+    def __init__(self, directory: str, config: dict) -> None:
+        """Starts a new dataset in `directory`, or resumes the one already there.
+        Raises ValueError if the existing dataset was made with other settings."""
+        self.__directory = directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as manifest_file:
+                self.manifest = json.load(manifest_file)
+            if self.manifest["version"] != VERSION:
+                raise ValueError(
+                    f"{directory} holds a version {self.manifest['version']} dataset"
+                )
+            if self.manifest["config"] != config:
+                raise ValueError(
+                    f"{directory} holds a dataset made with {self.manifest['config']}"
+                )
+        else:
+            self.manifest = {"version": VERSION, "config": config, "shards": []}
+        self.__descr = record_descr(config["rows"], config["columns"])
+        self.__shard_size = config["shard_size"]
+        self.__file = None
+        self.__count = 0
+        shards = self.manifest["shards"]
+        self.cursor: tuple[int, int] = (
+            (shards[-1]["next_game"], shards[-1]["next_ply"]) if shards else (0, 0)
+        )
+        """Game and record index within it that the next record comes from"""
+
+    def positions(self) -> int:
+        return sum(shard["positions"] for shard in self.manifest["shards"])
+
+    def write(self, game: int, records: list[bytes]) -> int:
+        """Writes the records of `game` that aren't already in a finished shard and
+        returns how many that was"""
+        _, skip = self.cursor if self.cursor[0] == game else (game, 0)
+        for index in range(skip, len(records)):
+            if self.__count == self.__shard_size:
+                self.seal()
+            if self.__file is None:
+                self.__open()
+            self.__file.write(records[index])
+            self.__count += 1
+            self.cursor = (game, index + 1)
+        self.cursor = (game + 1, 0)
+        return len(records) - skip
+
+    def seal(self):
+        """Finishes the current shard, if it holds anything, and records it"""
+        if self.__file is None:
+            return
+        self.__file.seek(0)
+        self.__file.write(npy_header(self.__descr, self.__count))
+        self.__file.close()
+        self.__file = None
+        shards = self.manifest["shards"]
+        shards.append(
+            {
+                "file": self.__name(len(shards)),
+                "positions": self.__count,
+                "next_game": self.cursor[0],
+                "next_ply": self.cursor[1],
+            }
+        )
+        self.__count = 0
+        path = os.path.join(self.__directory, MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def __open(self):
+        name = self.__name(len(self.manifest["shards"]))
+        # any file already here is a shard an interrupted run never finished
+        self.__file = open(os.path.join(self.__directory, name), "wb")
+        self.__file.write(npy_header(self.__descr, 0))
+
+    def __name(self, index: int) -> str:
+        return f"shard-{index:05d}.npy"
+
+
+def generate(
+    directory: str,
+    games: int,
+    workers: int | None = None,
+    rows: int = 6,
+    columns: int = 7,
+    win_length: int = 4,
+    depth: int = 4,
+    opening_plies: int = 4,
+    seed: int = 0,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    tt_size: int = 1 << 16,
+):
+    """Plays games until `games` have been written to the dataset in `directory`"""
+    config = {
+        "rows": rows,
+        "columns": columns,
+        "connect": win_length,
+        "depth": depth,
+        "opening_plies": opening_plies,
+        "seed": seed,
+        "shard_size": shard_size,
+        "tt_size": tt_size,
+    }
+    writer = ShardWriter(directory, config)
+    first = writer.cursor[0]
+    if first >= games:
+        print(f"{directory} already holds {first} games")
+        return
+    start = time.perf_counter()
+    written = writer.positions()
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers)
+    try:
+        # keep a bounded window of games in flight and write them in order, so the
+        # shards don't depend on which worker finishes first
+        pending: deque[tuple[int, Future]] = deque()
+        next_game = first
+        while pending or next_game < games:
+            while next_game < games and len(pending) < 2 * workers:
+                pending.append((next_game, pool.submit(play_game, config, next_game)))
+                next_game += 1
+            game, future = pending.popleft()
+            written += writer.write(game, future.result())
+            if (game + 1) % 100 == 0 or game + 1 == games:
+                elapsed = time.perf_counter() - start
+                print(
+                    f"[{game + 1}/{games}] {written} positions,"
+                    f" {(game + 1 - first) / elapsed:.1f} games/s"
+                )
+    finally:
+        pool.shutdown(cancel_futures=True)
+    writer.seal()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser(
+        "generate", help="play games into a new dataset, or resume one"
+    )
+    run.add_argument("directory")
+    run.add_argument("--games", type=int, required=True, help="total games wanted")
+    run.add_argument("--workers", type=int, default=None)
+    run.add_argument("--rows", type=int, default=6)
+    run.add_argument("--columns", type=int, default=7)
+    run.add_argument("--connect", type=int, default=4)
+    run.add_argument("--depth", type=int, default=4)
+    run.add_argument("--opening-plies", type=int, default=4)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    info = commands.add_parser("info", help="summarise a dataset")
+    info.add_argument("directory")
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        try:
+            generate(
+                args.directory,
+                args.games,
+                args.workers,
+                args.rows,
+                args.columns,
+                args.connect,
+                args.depth,
+                args.opening_plies,
+                args.seed,
+                args.shard_size,
+            )
+        except KeyboardInterrupt:
+            print("Interrupted; run the same command again to resume")
+    else:
+        with open(os.path.join(args.directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        shards = manifest["shards"]
+        positions = sum(shard["positions"] for shard in shards)
+        games = shards[-1]["next_game"] if shards else 0
+        print(f"{len(shards)} shards, {positions} positions from {games} games")
+        print(json.dumps(manifest["config"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
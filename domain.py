@@ -9,10 +9,80 @@ class PositionState(Enum):
 
 
 class LogEntry:
-    def __init__(self, nodes_explored, total_nodes, turn_duration) -> None:
+    def __init__(
+        self,
+        nodes_explored,
+        total_nodes,
+        turn_duration,
+        tt_hits=0,
+        tt_misses=0,
+        tt_evictions=0,
+        tt_entries=0,
+        depth_reached=0,
+        iteration_times=None,
+        iteration_nodes=None,
+        cutoffs=0,
+        first_move_cutoffs=0,
+        pondered=False,
+        ponder_nodes=0,
+        score=0,
+        from_book=False,
+        leaf_evaluations=0,
+        tt_probes=0,
+        solved=False,
+        distance=0,
+        principal_variation=None,
+        aspiration_researches=0,
+        forced=False,
+        good_threats=0,
+        opponent_good_threats=0,
+    ) -> None:
         self.nodes_explored = nodes_explored
         self.total_nodes = total_nodes
         self.turn_duration = turn_duration
+        self.tt_hits = tt_hits
+        self.tt_misses = tt_misses
+        self.tt_evictions = tt_evictions
+        self.tt_entries = tt_entries
+        self.depth_reached = depth_reached
+        self.iteration_times: list[float] = iteration_times or []
+        """Seconds spent on each completed search depth, shallowest first"""
+        self.iteration_nodes: list[int] = iteration_nodes or []
+        """Nodes searched so far in this move at the end of each completed depth"""
+        self.cutoffs = cutoffs
+        self.first_move_cutoffs = first_move_cutoffs
+        self.pondered = pondered
+        """Whether the move reused a search made during the opponent's turn"""
+        self.ponder_nodes = ponder_nodes
+        self.score = score
+        """Search score of the chosen move, from the CPU player's point of view. When
+        `solved`, this is the exact solver score instead: positive wins, 0 draws."""
+        self.from_book = from_book
+        """Whether the move was read from the opening book rather than searched"""
+        self.leaf_evaluations = leaf_evaluations
+        self.tt_probes = tt_probes
+        self.solved = solved
+        """Whether the move came from the exact endgame solver"""
+        self.distance = distance
+        """When `solved`, plies until the game ends with perfect play, counting this move"""
+        self.principal_variation: list[int] = principal_variation or []
+        """Columns the search expects to be played next, starting with the CPU player's move"""
+        self.aspiration_researches = aspiration_researches
+        """Searches repeated with a wider window because the score fell outside the aspiration window"""
+        self.forced = forced
+        """Whether the move was the only sensible one and was played without a search"""
+        self.good_threats = good_threats
+        """Threats on rows whose parity favours the CPU player in zugzwang (odd rows
+        for player 1, even for player 2) that it holds after this move"""
+        self.opponent_good_threats = opponent_good_threats
+        """The same count for the opponent"""
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """Share of cutoffs caused by the first move searched, a measure of move ordering quality"""
+        if self.cutoffs == 0:
+            return 0
+        return self.first_move_cutoffs / self.cutoffs
 
 
 class IBoard(ABC):
@@ -20,6 +90,14 @@ class IBoard(ABC):
     def accept_move(self, col: int, player: int) -> bool:
         """This will return false if the board is full in that column, true otherwise, and will modify its state accordingly."""
 
+    @abstractmethod
+    def undo_move(self) -> bool:
+        """This will take back the last accepted move, returning false if there is nothing to undo."""
+
+    @abstractmethod
+    def moves(self) -> list[int]:
+        """Returns the columns played so far, in order"""
+
     @abstractmethod
     def state(self, row: int, col: int) -> int:
         """This will return the state of a given position on the board, either empty or Player1, or Player2, the latter two indicating a piece is in the position"""
@@ -40,6 +118,10 @@ class IBoard(ABC):
     def rows(self) -> int:
         """Return row count for ranging over"""
 
+    @abstractmethod
+    def win_length(self) -> int:
+        """Returns the number of pieces in a row needed to win"""
+
     @abstractmethod
     def is_full(self) -> bool:
         """Returns true if no spaces remain on board, false otherwise"""
@@ -48,6 +130,26 @@ class IBoard(ABC):
     def last_added(self) -> tuple[int, int]:
         """Returns the cell of the last piece added"""
 
+    @abstractmethod
+    def key(self) -> int:
+        """Returns an integer uniquely identifying the current position"""
+
+    @abstractmethod
+    def pieces(self, player: int) -> int:
+        """Returns a bitboard of the cells occupied by player: bit `col * (rows + 1) + height` is set for each piece, counting height from the bottom"""
+
+    @abstractmethod
+    def open_windows(self, player: int) -> list[int]:
+        """Returns, indexed by n, how many lines of win_length() cells hold n of player's pieces and none of the opponent's"""
+
+    @abstractmethod
+    def piece_count(self) -> int:
+        """Returns the number of pieces on the board"""
+
+    @abstractmethod
+    def zobrist_hash(self) -> int:
+        """Returns the 64-bit Zobrist hash of the current position, updated incrementally on every move"""
+
 
 class IGame(ABC):
     @abstractmethod
@@ -77,6 +179,30 @@ class IGame(ABC):
     def get_player_input(self, player: int) -> int:
         """This will get the player input"""
 
+    @abstractmethod
+    def play_move(self, col: int, player: int) -> bool:
+        """This will drop player's piece in col and record the move, returning false if the column is full"""
+
+    @abstractmethod
+    def begin_cpu_move(self):
+        """This will start the CPU player's search in the background"""
+
+    @abstractmethod
+    def poll_cpu_move(self) -> int | None:
+        """This will return the CPU player's move once its background search is done, None until then"""
+
+    @abstractmethod
+    def cancel_cpu_move(self):
+        """This will stop a background CPU search that is still running"""
+
+    @abstractmethod
+    def begin_pondering(self):
+        """This will let the CPU player search in the background during the human's turn"""
+
+    @abstractmethod
+    def stop_pondering(self):
+        """This will stop the CPU player's background pondering"""
+
     @abstractmethod
     def board(self) -> IBoard:
         """This will return the board"""
@@ -94,6 +220,22 @@ class IGame(ABC):
         """This returns a multi-line string with all the required stats"""
 
 
+class IMoveOrderer(ABC):
+    @abstractmethod
+    def new_search(self):
+        """Called before each search from the root so per-search state can be reset"""
+
+    @abstractmethod
+    def order(
+        self, moves: list[int], ply: int, player: int, tt_move: int | None
+    ) -> list[int]:
+        """Returns `moves` in the order they should be searched at `ply` plies from the root"""
+
+    @abstractmethod
+    def record_cutoff(self, move: int, ply: int, depth: int, player: int, index: int):
+        """Called when `move`, searched as the `index`th child, caused a cutoff"""
+
+
 class IRenderer(ABC):
     @abstractmethod
     def render(self):
@@ -0,0 +1,143 @@
+from functools import lru_cache
+from domain import IBoard
+
+
+class EvalWeights:
+    def __init__(self, two: float = 1, three: float = 5, win: float = 1000) -> None:
+        self.two = two
+        """Score for a window holding two of a player's pieces and no opposing ones"""
+        self.three = three
+        """Score for a window holding three of a player's pieces and no opposing ones"""
+        self.win = win
+        """Score for a completed window"""
+
+    def by_count(self, win_length: int = 4) -> list[float]:
+        """Weights indexed by the number of a player's pieces in an unblocked window"""
+        weights = [0.0] * (win_length + 1)
+        if win_length >= 2:
+            weights[win_length - 2] = self.two
+        weights[win_length - 1] = self.three
+        weights[win_length] = self.win
+        return weights
+
+
+@lru_cache(maxsize=None)
+def window_masks(rows: int, cols: int, win_length: int = 4) -> tuple[int, ...]:
+    """Every line of `win_length` cells on the board, as bitboard masks in the
+    IBoard.pieces() layout. A 7x6 board has 69 of them."""
+    col_bits = rows + 1
+    masks = []
+    # (columns to step, rows to step) along each line direction
+    for d_col, d_height in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for col in range(cols):
+            for height in range(rows):
+                end_col = col + d_col * (win_length - 1)
+                end_height = height + d_height * (win_length - 1)
+                if not (0 <= end_col < cols and 0 <= end_height < rows):
+                    continue
+                mask = 0
+                for i in range(win_length):
+                    mask |= 1 << ((col + d_col * i) * col_bits + height + d_height * i)
+                masks.append(mask)
+    return tuple(masks)
+
+
+@lru_cache(maxsize=None)
+def cell_windows(
+    rows: int, cols: int, win_length: int = 4
+) -> tuple[tuple[int, ...], ...]:
+    """For every bit index of the IBoard.pieces() layout, the indexes into
+    window_masks() of the windows passing through that cell"""
+    through: list[list[int]] = [[] for _ in range(cols * (rows + 1))]
+    for index, mask in enumerate(window_masks(rows, cols, win_length)):
+        while mask:
+            low = mask & -mask
+            through[low.bit_length() - 1].append(index)
+            mask ^= low
+    return tuple(tuple(windows) for windows in through)
+
+
+class WindowTracker:
+    """Running per-window piece counts for both players.
+
+    A move only changes the windows through the cell it was played in, so add()
+    and remove() update those and leave the rest alone. From the counts the
+    tracker keeps, per player, how many windows are still open to that player
+    (hold none of the opponent's pieces) grouped by how many of the player's
+    pieces they hold, and how many windows the player has completed.
+    """
+
+    def __init__(self, rows: int, cols: int, win_length: int = 4) -> None:
+        self.__win_length = win_length
+        self.__through = cell_windows(rows, cols, win_length)
+        windows = len(window_masks(rows, cols, win_length))
+        # indexed by player number, slot 0 unused
+        self.__counts = [[0] * windows for _ in range(3)]
+        self.open_windows = [[0] * (win_length + 1) for _ in range(3)]
+        """open_windows[player][n]: windows holding n of player's pieces and none of the opponent's, for n >= 1"""
+        self.wins = [0, 0, 0]
+        """Completed windows per player"""
+        self.pieces = 0
+
+    def add(self, player: int, bit: int):
+        """Records a piece for player at bit index `bit`"""
+        mine_counts = self.__counts[player]
+        their_counts = self.__counts[3 - player]
+        mine_open = self.open_windows[player]
+        for window in self.__through[bit]:
+            mine = mine_counts[window]
+            theirs = their_counts[window]
+            if theirs == 0:
+                if mine:
+                    mine_open[mine] -= 1
+                mine_open[mine + 1] += 1
+                if mine + 1 == self.__win_length:
+                    self.wins[player] += 1
+            elif mine == 0:
+                # the opponent's window is now blocked
+                self.open_windows[3 - player][theirs] -= 1
+            mine_counts[window] = mine + 1
+        self.pieces += 1
+
+    def remove(self, player: int, bit: int):
+        """Takes back a piece added with add()"""
+        mine_counts = self.__counts[player]
+        their_counts = self.__counts[3 - player]
+        mine_open = self.open_windows[player]
+        for window in self.__through[bit]:
+            mine = mine_counts[window]
+            theirs = their_counts[window]
+            if theirs == 0:
+                mine_open[mine] -= 1
+                if mine > 1:
+                    mine_open[mine - 1] += 1
+                if mine == self.__win_length:
+                    self.wins[player] -= 1
+            elif mine == 1:
+                self.open_windows[3 - player][theirs] += 1
+            mine_counts[window] = mine - 1
+        self.pieces -= 1
+
+
+class Evaluator:
+    """Scores a position from its open windows: every window containing pieces of
+    only one player counts for that player, weighted by how many pieces it holds.
+    The boards keep those counts up to date move by move, so scoring is O(1)."""
+
+    def __init__(self, weights: EvalWeights | None = None, win_length: int = 4) -> None:
+        self.weights = weights or EvalWeights()
+        self.__by_count = self.weights.by_count(win_length)
+
+    def evaluate(self, board: IBoard, player: int) -> float:
+        """Score of the position from `player`'s point of view"""
+        mine = board.open_windows(player)
+        theirs = board.open_windows(3 - player)
+        return sum(
+            weight * (mine[count] - theirs[count])
+            for count, weight in enumerate(self.__by_count)
+            if weight
+        )
+
+    def count_windows(self, board: IBoard, player: int, pieces: int) -> int:
+        """Number of windows holding exactly `pieces` of player's pieces and none of the opponent's"""
+        return board.open_windows(player)[pieces]
@@ -2,20 +2,51 @@ from board import new_board
 from domain import IBoard, IGame, LogEntry
 from cli_renderer import new_CLI_renderer
 import cpu_player
+from opening_book import load_opening_book
+from position_cache import load_position_cache
+from game_records import GameRecord, GameRecorder, append_game_record
 
 
-def new_game() -> IGame:
-    return Game()
+def new_game(
+    rows: int = 6,
+    columns: int = 7,
+    win_length: int = 4,
+    cache_path: str | None = None,
+    record_path: str | None = None,
+) -> IGame:
+    return Game(rows, columns, win_length, cache_path, record_path)
 
 
 class Game(IGame):
-    def __init__(self) -> None:
-        self.__board = new_board(7, 6)
+    def __init__(
+        self,
+        rows: int = 6,
+        columns: int = 7,
+        win_length: int = 4,
+        cache_path: str | None = None,
+        record_path: str | None = None,
+    ) -> None:
+        """`cache_path` names a persistent position cache to share with other games.
+        When `record_path` is given, the game is appended to that game record file
+        once it is over."""
+        self.__board = new_board(columns, rows, win_length=win_length)
         self.players = 2
         self.p2_human = False
-        self.cpu_player = cpu_player.new_cpu_player(self.__board, 2, 1)
+        self.cpu_player = cpu_player.new_cpu_player(
+            self.__board,
+            2,
+            1,
+            opening_book=load_opening_book(),
+            position_cache=(
+                load_position_cache(cache_path, rows, columns, win_length)
+                if cache_path is not None
+                else None
+            ),
+        )
         self.__current_player = 1
         self.__renderer = new_CLI_renderer(self.__board)
+        self.__recorder = GameRecorder(self.__board)
+        self.__record_path = record_path
 
     def quit(self):
         raise NotImplementedError
@@ -55,18 +86,54 @@ class Game(IGame):
         if player == 2 and self.p2_human == False:
             return self.cpu_player.move()
         else:
+            self.begin_pondering()
             while not valid_input_rcvd:
+                columns = self.__board.columns()
                 input_str = input(
-                    f"Player {player}: Select a column (1-7) to place your piece: "
+                    f"Player {player}: Select a column (1-{columns}) to place your piece: "
                 )
                 try:
                     col = int(input_str)
-                    if 1 <= col <= 7:
+                    if 1 <= col <= columns:
                         valid_input_rcvd = True
                 except ValueError:
                     print("Non-integer received - must be an integer.")
+            self.stop_pondering()
             return col - 1
 
+    def play_move(self, col: int, player: int) -> bool:
+        if not self.__board.accept_move(col, player):
+            return False
+        cpu_move = player == 2 and not self.p2_human
+        self.__recorder.record(col, self.cpu_player.stats() if cpu_move else None)
+        over = self.__board.check_win(player) or self.__board.is_full()
+        if over and self.__record_path is not None:
+            append_game_record(self.__record_path, self.__recorder.finish())
+            # a game is only written once, however the frontend carries on
+            self.__record_path = None
+        return True
+
+    def record(self) -> GameRecord:
+        """The moves played so far, with the CPU player's stats for its moves"""
+        return self.__recorder.finish()
+
+    def begin_cpu_move(self):
+        self.cpu_player.start_move()
+
+    def poll_cpu_move(self) -> int | None:
+        return self.cpu_player.poll_move()
+
+    def cancel_cpu_move(self):
+        self.cpu_player.cancel()
+        self.cpu_player.stop_pondering()
+
+    def begin_pondering(self):
+        if not self.p2_human:
+            self.cpu_player.start_pondering()
+
+    def stop_pondering(self):
+        self.cpu_player.stop_pondering()
+
     def current_player(self) -> int:
         return self.__current_player
 
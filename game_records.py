@@ -0,0 +1,340 @@
+"""Append-only binary records of finished games, for replay and analysis.
+
+    python game_records.py show games.c4r --limit 10
+    python game_records.py replay games.c4r
+    python game_records.py export games.c4r --output games.jsonl
+
+A record file starts with a small header and then holds one record per game, each
+a 4-byte length prefix followed by the record body:
+
+    rows, columns, win length, result, move count    RECORD_HEADER
+    one byte per move: the 0-based column
+    per move: a flags byte, and for CPU moves four varints:
+        nodes searched, search time in microseconds, depth, zigzag rounded score
+
+Human moves cost two bytes and CPU moves typically eight to ten. Files are only
+ever appended to, and the length prefix lets a reader skip or stream records
+without parsing them, so read_game_records() can walk millions of games in
+constant memory.
+"""
+
+from __future__ import annotations
+import argparse
+from enum import Enum
+import json
+import struct
+import sys
+import time
+from typing import BinaryIO, Iterator
+from board import new_board, to_move_string
+from domain import IBoard, LogEntry
+
+MAGIC = b"C4GR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sB")
+"""magic, version"""
+LENGTH = struct.Struct("<I")
+RECORD_HEADER = struct.Struct("<BBBBH")
+"""rows, columns, win length, result, move count"""
+
+
+class GameResult(Enum):
+    Unfinished = 0
+    Player1 = 1
+    Player2 = 2
+    Draw = 3
+
+
+class MoveFlags:
+    Searched = 1
+    """The move was chosen by the CPU player and stats follow"""
+    FromBook = 2
+    Solved = 4
+    Pondered = 8
+    Forced = 16
+
+
+class GameRecord:
+    def __init__(
+        self,
+        rows: int,
+        columns: int,
+        win_length: int,
+        moves: list[int],
+        stats: list[LogEntry | None],
+        result: GameResult,
+    ) -> None:
+        self.rows = rows
+        self.columns = columns
+        self.win_length = win_length
+        self.moves = moves
+        """0-based columns, player 1 first"""
+        self.stats = stats
+        """The CPU player's stats for each move, None for moves it didn't choose"""
+        self.result = result
+
+    @property
+    def move_string(self) -> str:
+        return to_move_string(self.moves)
+
+    def positions(self) -> Iterator[IBoard]:
+        """Yields the board after each move. The same board is updated in place, so
+        copy anything needed before advancing."""
+        board = new_board(
+            self.columns, self.rows, bitboard=True, win_length=self.win_length
+        )
+        for turn, col in enumerate(self.moves):
+            board.accept_move(col, turn % 2 + 1)
+            yield board
+
+    def board(self, ply: int | None = None) -> IBoard:
+        """The position after the first `ply` moves, by default after the last"""
+        board = new_board(
+            self.columns, self.rows, bitboard=True, win_length=self.win_length
+        )
+        for turn, col in enumerate(self.moves[:ply]):
+            board.accept_move(col, turn % 2 + 1)
+        return board
+
+
+class GameRecorder:
+    """Collects the moves of a game as it is played"""
+
+    def __init__(self, board: IBoard) -> None:
+        self.__board = board
+        self.__moves: list[int] = []
+        self.__stats: list[LogEntry | None] = []
+
+    def record(self, col: int, stats: LogEntry | None = None):
+        self.__moves.append(col)
+        self.__stats.append(stats)
+
+    def finish(self) -> GameRecord:
+        board = self.__board
+        if board.check_win(1):
+            result = GameResult.Player1
+        elif board.check_win(2):
+            result = GameResult.Player2
+        elif board.is_full():
+            result = GameResult.Draw
+        else:
+            result = GameResult.Unfinished
+        return GameRecord(
+            board.rows(),
+            board.columns(),
+            board.win_length(),
+            list(self.__moves),
+            list(self.__stats),
+            result,
+        )
+
+
+class GameRecordWriter:
+    """Appends records to a file, writing the file header first if it is new"""
+
+    def __init__(self, path: str) -> None:
+        self.__file = open(path, "ab")
+        if self.__file.tell() == 0:
+            self.__file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def append(self, record: GameRecord):
+        body = encode_record(record)
+        self.__file.write(LENGTH.pack(len(body)) + body)
+
+    def close(self):
+        self.__file.close()
+
+    def __enter__(self) -> GameRecordWriter:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def append_game_record(path: str, record: GameRecord):
+    with GameRecordWriter(path) as writer:
+        writer.append(record)
+
+
+def read_game_records(path: str) -> Iterator[GameRecord]:
+    """Streams every record in the file, in the order they were appended"""
+    with open(path, "rb") as records:
+        yield from read_game_stream(records)
+
+
+def read_game_stream(stream: BinaryIO) -> Iterator[GameRecord]:
+    magic, version = FILE_HEADER.unpack(stream.read(FILE_HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} game record file")
+    while prefix := stream.read(LENGTH.size):
+        (length,) = LENGTH.unpack(prefix)
+        body = stream.read(length)
+        if len(body) < length:
+            # a writer was interrupted mid-record; everything before it is intact
+            return
+        yield decode_record(body)
+
+
+def encode_record(record: GameRecord) -> bytes:
+    body = bytearray(
+        RECORD_HEADER.pack(
+            record.rows,
+            record.columns,
+            record.win_length,
+            record.result.value,
+            len(record.moves),
+        )
+    )
+    body += bytes(record.moves)
+    for stats in record.stats:
+        if stats is None:
+            body.append(0)
+            continue
+        flags = MoveFlags.Searched
+        if stats.from_book:
+            flags |= MoveFlags.FromBook
+        if stats.solved:
+            flags |= MoveFlags.Solved
+        if stats.pondered:
+            flags |= MoveFlags.Pondered
+        if stats.forced:
+            flags |= MoveFlags.Forced
+        body.append(flags)
+        score = round(stats.score)
+        _write_varint(body, stats.nodes_explored)
+        _write_varint(body, round(stats.turn_duration * 1_000_000))
+        _write_varint(body, stats.depth_reached)
+        _write_varint(body, score << 1 if score >= 0 else (-score << 1) - 1)
+    return bytes(body)
+
+
+def decode_record(body: bytes) -> GameRecord:
+    rows, columns, win_length, result, count = RECORD_HEADER.unpack_from(body)
+    offset = RECORD_HEADER.size
+    moves = list(body[offset : offset + count])
+    offset += count
+    stats: list[LogEntry | None] = []
+    total_nodes = 0
+    for _ in range(count):
+        flags = body[offset]
+        offset += 1
+        if not flags & MoveFlags.Searched:
+            stats.append(None)
+            continue
+        nodes, offset = _read_varint(body, offset)
+        micros, offset = _read_varint(body, offset)
+        depth, offset = _read_varint(body, offset)
+        zigzag, offset = _read_varint(body, offset)
+        total_nodes += nodes
+        stats.append(
+            LogEntry(
+                nodes,
+                total_nodes,
+                micros / 1_000_000,
+                depth_reached=depth,
+                score=zigzag >> 1 if not zigzag & 1 else -((zigzag + 1) >> 1),
+                from_book=bool(flags & MoveFlags.FromBook),
+                solved=bool(flags & MoveFlags.Solved),
+                pondered=bool(flags & MoveFlags.Pondered),
+                forced=bool(flags & MoveFlags.Forced),
+            )
+        )
+    return GameRecord(rows, columns, win_length, moves, stats, GameResult(result))
+
+
+def _write_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="print one line per game")
+    show.add_argument("path")
+    show.add_argument("--limit", type=int)
+    replay = commands.add_parser(
+        "replay", help="rebuild every position and report the replay speed"
+    )
+    replay.add_argument("path")
+    export = commands.add_parser("export", help="write the games as JSON lines")
+    export.add_argument("path")
+    export.add_argument("--output", help="defaults to standard output")
+    args = parser.parse_args(argv)
+    records = read_game_records(args.path)
+    if args.command == "show":
+        for index, record in enumerate(records):
+            if args.limit is not None and index >= args.limit:
+                break
+            searched = [stats for stats in record.stats if stats is not None]
+            print(
+                f"{record.columns}x{record.rows} connect {record.win_length}"
+                f" {record.result.name:<10} {len(record.moves):>3} moves"
+                f" {sum(stats.nodes_explored for stats in searched):>9} nodes"
+                f" {record.move_string}"
+            )
+    elif args.command == "replay":
+        start = time.perf_counter()
+        games = positions = 0
+        for record in records:
+            games += 1
+            for _ in record.positions():
+                positions += 1
+        elapsed = time.perf_counter() - start
+        print(
+            f"{games} games, {positions} positions in {elapsed:.2f}s"
+            f" ({positions / max(elapsed, 1e-9):.0f} positions/s)"
+        )
+    else:
+        output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            for record in records:
+                output.write(json.dumps(record_to_json(record)) + "\n")
+        finally:
+            if args.output:
+                output.close()
+
+
+def record_to_json(record: GameRecord) -> dict:
+    return {
+        "rows": record.rows,
+        "columns": record.columns,
+        "connect": record.win_length,
+        "result": record.result.name,
+        "moves": record.move_string,
+        "stats": [
+            (
+                None
+                if stats is None
+                else {
+                    "nodes": stats.nodes_explored,
+                    "seconds": stats.turn_duration,
+                    "depth": stats.depth_reached,
+                    "score": stats.score,
+                    "from_book": stats.from_book,
+                    "solved": stats.solved,
+                    "pondered": stats.pondered,
+                    "forced": stats.forced,
+                }
+            )
+            for stats in record.stats
+        ],
+    }
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,81 @@
+"""Search tracing.
+
+Tracing is off unless an AIPlayer is given a Tracer. The search only checks a
+boolean per node, so with tracing off (or at the Move level) the hot path does no
+extra work. Events are dicts with an "event" name plus event-specific fields, and
+go to a sink: the logging module, a JSONL file or an in-memory ring buffer.
+"""
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections import deque
+from enum import IntEnum
+import json
+import logging
+import time
+
+
+class TraceLevel(IntEnum):
+    Off = 0
+    Move = 1
+    """One event per search start, completed depth and search end"""
+    Node = 2
+    """Also one event per node, cutoff and leaf evaluation; slows the search down a lot"""
+
+
+class TraceSink(ABC):
+    @abstractmethod
+    def emit(self, event: dict):
+        """Records one trace event"""
+
+    def close(self):
+        """Releases any resources held by the sink"""
+
+
+class LoggingSink(TraceSink):
+    def __init__(
+        self, logger: logging.Logger | None = None, level: int = logging.DEBUG
+    ) -> None:
+        self.__logger = logger or logging.getLogger("cpu_player.search")
+        self.__level = level
+
+    def emit(self, event: dict):
+        self.__logger.log(self.__level, "%s", json.dumps(event))
+
+
+class JsonlSink(TraceSink):
+    def __init__(self, path: str) -> None:
+        self.__file = open(path, "a", encoding="utf-8")
+
+    def emit(self, event: dict):
+        self.__file.write(json.dumps(event) + "\n")
+
+    def close(self):
+        self.__file.close()
+
+
+class RingBufferSink(TraceSink):
+    """Keeps the most recent `capacity` events in memory"""
+
+    def __init__(self, capacity: int = 10_000) -> None:
+        self.__events: deque[dict] = deque(maxlen=capacity)
+
+    def emit(self, event: dict):
+        self.__events.append(event)
+
+    def events(self) -> list[dict]:
+        return list(self.__events)
+
+
+class Tracer:
+    def __init__(self, sink: TraceSink, level: TraceLevel = TraceLevel.Move) -> None:
+        self.sink = sink
+        self.level = level
+
+    def enabled(self, level: TraceLevel) -> bool:
+        return self.level >= level
+
+    def emit(self, event: str, **fields):
+        fields["event"] = event
+        fields["time"] = time.time()
+        self.sink.emit(fields)
@@ -1,9 +1,22 @@
+import argparse
+from functools import partial
 from pygame_interface import PygameInterface
 from game import new_game
 
 
 def main():
-    interface = PygameInterface(new_game)
+    parser = argparse.ArgumentParser(description="Play Connect 4 in a window")
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--columns", type=int, default=7)
+    parser.add_argument("--connect", type=int, default=4, help="pieces in a row to win")
+    parser.add_argument("--cache", help="persistent position cache file to use")
+    parser.add_argument("--record", help="game record file to append games to")
+    args = parser.parse_args()
+    interface = PygameInterface(
+        partial(
+            new_game, args.rows, args.columns, args.connect, args.cache, args.record
+        )
+    )
     interface.run()
 
 
@@ -0,0 +1,92 @@
+from functools import lru_cache
+from domain import IMoveOrderer
+
+
+def new_move_orderer(columns: int, heuristic: bool = True) -> IMoveOrderer:
+    if heuristic:
+        return HeuristicOrderer(columns)
+    return StaticOrderer(columns)
+
+
+@lru_cache(maxsize=None)
+def center_out(columns: int) -> tuple[int, ...]:
+    """Columns sorted from the middle outwards, e.g. 3, 2, 4, 1, 5, 0, 6 for 7 columns"""
+    middle = (columns - 1) / 2
+    return tuple(sorted(range(columns), key=lambda col: abs(col - middle)))
+
+
+class StaticOrderer(IMoveOrderer):
+    """Searches central columns first, since they take part in the most lines"""
+
+    def __init__(self, columns: int) -> None:
+        self._rank = [0] * columns
+        for rank, col in enumerate(center_out(columns)):
+            self._rank[col] = columns - rank
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order(
+        self, moves: list[int], ply: int, player: int, tt_move: int | None
+    ) -> list[int]:
+        ordered = sorted(moves, key=self._rank.__getitem__, reverse=True)
+        if tt_move is not None and tt_move in moves and ordered[0] != tt_move:
+            ordered.remove(tt_move)
+            ordered.insert(0, tt_move)
+        return ordered
+
+    def record_cutoff(self, move: int, ply: int, depth: int, player: int, index: int):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+
+class HeuristicOrderer(StaticOrderer):
+    """Orders the transposition table move first, then this ply's killer moves, then
+    by history score, falling back on center-out order.
+
+    Killers are the last two moves that caused a cutoff at a ply; a move that refuted
+    one line often refutes its siblings too. The history table accumulates depth^2
+    for every cutoff a player's move causes anywhere in the tree.
+    """
+
+    killer_slots = 2
+
+    def __init__(self, columns: int) -> None:
+        super().__init__(columns)
+        self.__killers: list[list[int]] = []
+        # indexed by player number, slot 0 unused
+        self.__history = [[0] * columns for _ in range(3)]
+
+    def new_search(self):
+        super().new_search()
+        self.__killers = []
+        # age the history so the previous move's tree doesn't dominate this one
+        for table in self.__history:
+            for col in range(len(table)):
+                table[col] >>= 1
+
+    def order(
+        self, moves: list[int], ply: int, player: int, tt_move: int | None
+    ) -> list[int]:
+        killers = self.__killers[ply] if ply < len(self.__killers) else []
+        history = self.__history[player]
+        rank = self._rank
+
+        def priority(move: int) -> tuple[bool, bool, int, int]:
+            return (move == tt_move, move in killers, history[move], rank[move])
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def record_cutoff(self, move: int, ply: int, depth: int, player: int, index: int):
+        super().record_cutoff(move, ply, depth, player, index)
+        while len(self.__killers) <= ply:
+            self.__killers.append([])
+        killers = self.__killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.killer_slots :]
+        self.__history[player][move] += depth * depth
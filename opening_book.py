@@ -0,0 +1,201 @@
+"""Opening book: best moves for the first plies of the game, found by deep offline search.
+
+    python opening_book.py build --plies 6 --depth 7 --output opening_book.bin
+    python opening_book.py probe 4453 --book opening_book.bin
+
+The file is a small header followed by fixed-size records of (position key, best
+move, score) sorted by key. Mirror-image positions share one record, stored under
+the smaller of the two keys. Lookups memory-map the file and binary search it, so
+opening a book reads nothing up front and each probe touches a few pages.
+"""
+
+from __future__ import annotations
+import argparse
+from functools import lru_cache
+import mmap
+import os
+import struct
+import sys
+from board import new_board, new_board_from_moves, parse_move_string
+from domain import IBoard
+
+MAGIC = b"C4BK"
+VERSION = 2
+HEADER = struct.Struct("<4sBBBBB")
+"""magic, version, rows, columns, win length, plies"""
+RECORD = struct.Struct("<QBh")
+"""position key, best move column, score from the side to move's point of view"""
+DEFAULT_BOOK_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "opening_book.bin"
+)
+
+
+def mirror_key(key: int, rows: int, cols: int) -> int:
+    """Key of the left-right mirror image of a position.
+
+    IBoard.key() packs each column into its own `rows + 1` bits without carries
+    between them, so mirroring is just reversing the order of the column chunks.
+    """
+    col_bits = rows + 1
+    col_mask = (1 << col_bits) - 1
+    mirrored = 0
+    for col in range(cols):
+        chunk = (key >> (col * col_bits)) & col_mask
+        mirrored |= chunk << ((cols - 1 - col) * col_bits)
+    return mirrored
+
+
+def canonical_key(board: IBoard) -> tuple[int, bool]:
+    """Returns the key a position is stored under and whether it is the mirrored one"""
+    key = board.key()
+    mirrored = mirror_key(key, board.rows(), board.columns())
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+
+class OpeningBook:
+    def __init__(self, path: str) -> None:
+        self.__file = open(path, "rb")
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.rows,
+            self.columns,
+            self.win_length,
+            self.plies,
+        ) = HEADER.unpack_from(self.__map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.__count = (len(self.__map) - HEADER.size) // RECORD.size
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def close(self):
+        self.__map.close()
+        self.__file.close()
+
+    def lookup(self, board: IBoard) -> tuple[int, int] | None:
+        """Returns (best move, score) for the position, or None if it isn't in the book"""
+        if (
+            board.rows() != self.rows
+            or board.columns() != self.columns
+            or board.win_length() != self.win_length
+            or len(board.moves()) > self.plies
+        ):
+            return None
+        key, mirrored = canonical_key(board)
+        low, high = 0, self.__count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, move, score = RECORD.unpack_from(
+                self.__map, HEADER.size + middle * RECORD.size
+            )
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                if mirrored:
+                    move = self.columns - 1 - move
+                return move, score
+        return None
+
+
+@lru_cache(maxsize=None)
+def load_opening_book(path: str = DEFAULT_BOOK_PATH) -> OpeningBook | None:
+    """Opens the book at `path`, or returns None if there isn't one. Every caller
+    shares the same mapping, so don't close the returned book."""
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def build_book(
+    path: str,
+    plies: int,
+    depth: int,
+    rows: int = 6,
+    cols: int = 7,
+    win_length: int = 4,
+) -> int:
+    """Searches every position reachable in fewer than `plies` moves to `depth` and
+    writes the book to `path`. Returns the number of positions written."""
+    from cpu_player import new_cpu_player
+
+    if (rows + 1) * cols > 64:
+        raise ValueError("Position keys for this board size don't fit in 64 bits")
+    records: dict[int, tuple[int, int]] = {}
+    frontier = [new_board(cols, rows, win_length=win_length)]
+    for ply in range(plies):
+        next_frontier = []
+        queued: set[int] = set()
+        for position in frontier:
+            key, mirrored = canonical_key(position)
+            player = ply % 2 + 1
+            ai = new_cpu_player(position, player, 3 - player)
+            ai.depth = depth
+            move = ai.move()
+            score = max(-(1 << 15), min((1 << 15) - 1, int(ai.stats().score)))
+            records[key] = (cols - 1 - move if mirrored else move, score)
+            for col in range(cols):
+                if position.state(0, col) != 0:
+                    continue
+                child = new_board_from_moves(
+                    position.moves() + [col], cols, rows, win_length=win_length
+                )
+                child_key = canonical_key(child)[0]
+                if child_key in queued or child.check_win(player) or child.is_full():
+                    continue
+                queued.add(child_key)
+                next_frontier.append(child)
+        frontier = next_frontier
+    with open(path, "wb") as book:
+        book.write(HEADER.pack(MAGIC, VERSION, rows, cols, win_length, plies))
+        for key in sorted(records):
+            move, score = records[key]
+            book.write(RECORD.pack(key, move, score))
+    return len(records)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="search the openings and write a book")
+    build.add_argument("--plies", type=int, default=6)
+    build.add_argument("--depth", type=int, default=7)
+    build.add_argument("--output", default=DEFAULT_BOOK_PATH)
+    build.add_argument("--rows", type=int, default=6)
+    build.add_argument("--columns", type=int, default=7)
+    build.add_argument("--connect", type=int, default=4, help="pieces in a row to win")
+    probe = commands.add_parser(
+        "probe", help="look up a position given as a move string"
+    )
+    probe.add_argument("moves", nargs="?", default="")
+    probe.add_argument("--book", default=DEFAULT_BOOK_PATH)
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        count = build_book(
+            args.output, args.plies, args.depth, args.rows, args.columns, args.connect
+        )
+        print(f"Wrote {count} positions to {args.output}")
+    else:
+        book = OpeningBook(args.book)
+        board = new_board_from_moves(
+            parse_move_string(args.moves),
+            book.columns,
+            book.rows,
+            win_length=book.win_length,
+        )
+        entry = book.lookup(board)
+        book.close()
+        if entry is None:
+            print("Position is not in the book")
+        else:
+            print(f"Best move: {entry[0] + 1}, score: {entry[1]}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,283 @@
+"""Persistent cache of searched positions, shared by every process on the machine.
+
+    python position_cache.py stats --cache positions.bin
+    python position_cache.py hottest --cache positions.bin --count 10
+
+The cache is one fixed-size file: a header followed by `buckets` buckets of
+SLOTS records each. A position lives in bucket `zobrist hash % buckets`. The file
+is memory-mapped shared, so every process sees the others' writes straight away
+and the contents survive restarts.
+
+Each record is two 64-bit words: a data word packing the score, depth, bound,
+best move and generation, and a check word holding `hash ^ data`. Readers take
+no lock. A record only counts as a hit when `check ^ data` equals the hash being
+probed, so a record that another process is half way through writing reads as a
+miss instead of as garbage. Writers hold an exclusive flock on the file.
+
+Aging and eviction: the header holds a generation counter that goes up by one
+every time a process opens the cache for writing. Records remember the
+generation they were last written in. A new result for a position already in
+its bucket replaces the old one unless the old one is deeper and from the
+current generation. Otherwise it takes an empty slot, and in a full bucket it
+evicts the record with the lowest `depth - AGE_PENALTY * age`, where age is the
+number of generations since the record was written. Deep results therefore
+outlive shallow ones, but stop being protected once they go unrefreshed.
+"""
+
+from __future__ import annotations
+import argparse
+from functools import lru_cache
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable
+from evaluation import EvalWeights
+from transposition import Bound, TTEntry
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; writes are then unsynchronised
+    fcntl = None
+
+MAGIC = b"C4PC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHHIIddd")
+"""magic, version, rows, columns, win length, buckets, generation, eval weights (two, three, win)"""
+GENERATION_OFFSET = 4 + 2 * 4 + 4
+RECORD = struct.Struct("<QQ")
+"""check word (hash ^ data), data word"""
+SLOTS = 4
+"""Records per bucket"""
+AGE_PENALTY = 2
+"""Plies of depth a record loses, for eviction purposes, per generation it goes unwritten"""
+DEFAULT_BUCKETS = 1 << 16
+SCORE = struct.Struct("<f")
+
+
+def pack_data(
+    depth: int, score: float, bound: Bound, best_move: int, generation: int
+) -> int:
+    """Packs a result into the 64-bit data word. Bits 0-31: score as a float32,
+    32-39: depth, 40-41: bound, 42-49: generation, 50-63: best move + 1."""
+    (score_bits,) = struct.unpack("<I", SCORE.pack(score))
+    return (
+        score_bits
+        | min(depth, 255) << 32
+        | bound.value << 40
+        | (generation & 0xFF) << 42
+        | (best_move + 1) << 50
+    )
+
+
+def unpack_data(key: int, data: int) -> tuple[TTEntry, int]:
+    """Returns the entry packed in `data` and the generation it was written in"""
+    (score,) = SCORE.unpack(struct.pack("<I", data & 0xFFFFFFFF))
+    entry = TTEntry(
+        key,
+        data >> 32 & 0xFF,
+        score,
+        Bound(data >> 40 & 0x3),
+        (data >> 50) - 1,
+    )
+    return entry, data >> 42 & 0xFF
+
+
+class PositionCache:
+    def __init__(
+        self,
+        path: str,
+        rows: int = 6,
+        cols: int = 7,
+        win_length: int = 4,
+        weights: EvalWeights | None = None,
+        buckets: int = DEFAULT_BUCKETS,
+        writable: bool = True,
+    ) -> None:
+        """Opens the cache at `path`, creating it with `buckets` buckets if it doesn't
+        exist. Opening it writable starts a new generation. Raises ValueError if
+        the file was made for another board or evaluation, since its scores would
+        mean nothing here."""
+        weights = weights or EvalWeights()
+        flags = os.O_RDWR | os.O_CREAT if writable else os.O_RDONLY
+        self.__fd = os.open(path, flags, 0o644)
+        self.__lock()
+        try:
+            if writable and os.fstat(self.__fd).st_size == 0:
+                header = HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    rows,
+                    cols,
+                    win_length,
+                    buckets,
+                    0,
+                    weights.two,
+                    weights.three,
+                    weights.win,
+                )
+                os.write(self.__fd, header)
+                os.ftruncate(self.__fd, HEADER.size + buckets * SLOTS * RECORD.size)
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self.__map = mmap.mmap(self.__fd, 0, access=access)
+            magic, version, *config, self.__buckets, generation = HEADER.unpack_from(
+                self.__map, 0
+            )[:7]
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} position cache")
+            stored_weights = HEADER.unpack_from(self.__map, 0)[7:]
+            if config != [rows, cols, win_length] or stored_weights != (
+                weights.two,
+                weights.three,
+                weights.win,
+            ):
+                raise ValueError(
+                    f"{path} holds positions for a different game or evaluation"
+                )
+            self.generation = generation
+            if writable:
+                self.generation = (generation + 1) & 0xFFFFFFFF
+                struct.pack_into("<I", self.__map, GENERATION_OFFSET, self.generation)
+        finally:
+            self.__unlock()
+        self.min_depth = 2
+        """Shallowest result worth writing; shallower ones are cheaper to search again"""
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def __len__(self) -> int:
+        """Number of occupied records"""
+        return sum(1 for _ in self.entries())
+
+    def capacity(self) -> int:
+        return self.__buckets * SLOTS
+
+    def probe(self, key: int) -> TTEntry | None:
+        offset = HEADER.size + (key % self.__buckets) * SLOTS * RECORD.size
+        for check, data in RECORD.iter_unpack(
+            self.__map[offset : offset + SLOTS * RECORD.size]
+        ):
+            if data and check ^ data == key:
+                self.hits += 1
+                return unpack_data(key, data)[0]
+        self.misses += 1
+        return None
+
+    def store_many(self, entries: Iterable[TTEntry]) -> int:
+        """Writes every entry at least `min_depth` deep under one lock and returns how
+        many were written"""
+        written = 0
+        self.__lock()
+        try:
+            for entry in entries:
+                if entry.depth >= self.min_depth and self.__store(entry):
+                    written += 1
+        finally:
+            self.__unlock()
+        self.writes += written
+        return written
+
+    def entries(self) -> Iterable[TTEntry]:
+        for check, data in RECORD.iter_unpack(self.__map[HEADER.size :]):
+            if data:
+                yield unpack_data(check ^ data, data)[0]
+
+    def hottest(self, count: int) -> list[TTEntry]:
+        """The `count` most valuable records: written most recently, then deepest"""
+        ranked = []
+        for check, data in RECORD.iter_unpack(self.__map[HEADER.size :]):
+            if data:
+                entry, generation = unpack_data(check ^ data, data)
+                age = (self.generation - generation) & 0xFF
+                ranked.append((age, -entry.depth, entry.key, entry))
+        ranked.sort(key=lambda item: item[:3])
+        return [entry for *_, entry in ranked[:count]]
+
+    def close(self):
+        self.__map.close()
+        os.close(self.__fd)
+
+    def __store(self, entry: TTEntry) -> bool:
+        start = HEADER.size + (entry.key % self.__buckets) * SLOTS * RECORD.size
+        empty = -1
+        victim = -1
+        victim_worth = 0
+        for slot in range(SLOTS):
+            offset = start + slot * RECORD.size
+            check, data = RECORD.unpack_from(self.__map, offset)
+            if not data:
+                if empty < 0:
+                    empty = offset
+                continue
+            old, generation = unpack_data(check ^ data, data)
+            age = (self.generation - generation) & 0xFF
+            if old.key == entry.key:
+                if old.depth > entry.depth and age == 0:
+                    return False
+                empty = offset
+                break
+            worth = old.depth - AGE_PENALTY * age
+            if victim < 0 or worth < victim_worth:
+                victim, victim_worth = offset, worth
+        if empty >= 0:
+            victim = empty
+        data = pack_data(
+            entry.depth, entry.score, entry.bound, entry.best_move, self.generation
+        )
+        RECORD.pack_into(self.__map, victim, entry.key ^ data, data)
+        return True
+
+    def __lock(self):
+        if fcntl is not None:
+            fcntl.flock(self.__fd, fcntl.LOCK_EX)
+
+    def __unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self.__fd, fcntl.LOCK_UN)
+
+
+@lru_cache(maxsize=None)
+def load_position_cache(
+    path: str, rows: int = 6, cols: int = 7, win_length: int = 4
+) -> PositionCache:
+    """Opens the cache for the default evaluation once per process, so a process
+    counts as one generation however many games it plays. Every caller shares the
+    same mapping, so don't close the returned cache."""
+    return PositionCache(path, rows, cols, win_length)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats = commands.add_parser("stats", help="show how full the cache is")
+    stats.add_argument("--cache", required=True)
+    hottest = commands.add_parser(
+        "hottest", help="list the entries warm-up loads first"
+    )
+    hottest.add_argument("--cache", required=True)
+    hottest.add_argument("--count", type=int, default=10)
+    args = parser.parse_args(argv)
+    with open(args.cache, "rb") as cache_file:
+        _, _, rows, cols, win_length, _, _, *weights = HEADER.unpack(
+            cache_file.read(HEADER.size)
+        )
+    cache = PositionCache(
+        args.cache, rows, cols, win_length, EvalWeights(*weights), writable=False
+    )
+    if args.command == "stats":
+        print(
+            f"{len(cache)} of {cache.capacity()} records used,"
+            f" generation {cache.generation}"
+        )
+    else:
+        for entry in cache.hottest(args.count):
+            print(
+                f"{entry.key:016x} depth {entry.depth} score {entry.score:g}"
+                f" {entry.bound.name} best move {entry.best_move + 1}"
+            )
+    cache.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -3,6 +3,7 @@ import math
 from typing import Callable
 import pygame
 import domain
+from board import to_move_string
 
 white = (255, 255, 255)
 blue = (0, 0, 255)
@@ -10,6 +11,9 @@ red = (255, 0, 0)
 yellow = (255, 255, 0)
 black = (0, 0, 0)
 
+FRAME_RATE = 30
+"""Most frames drawn per second; the loop sleeps for the rest of each frame"""
+
 
 class GameColors(enum.Enum):
     background = black
@@ -21,15 +25,19 @@ class GameColors(enum.Enum):
     board = blue
 
 
-col_key_map = {
-    pygame.K_1: 0,
-    pygame.K_2: 1,
-    pygame.K_3: 2,
-    pygame.K_4: 3,
-    pygame.K_5: 4,
-    pygame.K_6: 5,
-    pygame.K_7: 6,
-}
+column_keys = [
+    pygame.K_1,
+    pygame.K_2,
+    pygame.K_3,
+    pygame.K_4,
+    pygame.K_5,
+    pygame.K_6,
+    pygame.K_7,
+    pygame.K_8,
+    pygame.K_9,
+    pygame.K_0,
+]
+"""Keys for columns 1-10 in order; columns past the tenth are played by clicking"""
 
 
 class Button:
@@ -55,13 +63,23 @@ class Button:
             self._rect.bottomleft = self._pos
         else:
             self._rect.center = self._pos
+        self._dirty = True
 
-    def render(self):
+    def render(self) -> pygame.Rect | None:
+        """Draws the button unless it is already on screen and returns the area drawn"""
+        if not self._dirty:
+            return None
         pygame.draw.rect(
             self._screen, GameColors.board.value, self._rect, border_radius=20
         )
         text_rect = self._sfc.get_rect(center=self._rect.center)
         self._screen.blit(self._sfc, text_rect)
+        self._dirty = False
+        return self._rect
+
+    def invalidate(self):
+        """Draws the button again on the next render(), e.g. after the screen was cleared"""
+        self._dirty = True
 
 
 class Text:
@@ -78,52 +96,80 @@ class Text:
         self._font = font
         self._sfc = font.render(self._txt, True, GameColors.title_font.value)
         self._pos = pos
-        self._rect = self._sfc.get_rect()
         self._alignment = alignment
-        if self._alignment == "left":
-            self._rect.bottomleft = self._pos
-        else:
-            self._rect.center = self._pos
+        self._rect = self._place(self._sfc)
+        self._dirty = True
 
-    def render(self):
-        pygame.draw.rect(self._screen, GameColors.background.value, self._rect)
-        self._sfc = self._font.render(self._txt, True, white)
-        self._rect = self._sfc.get_rect()
+    def _place(self, sfc: pygame.Surface) -> pygame.Rect:
+        rect = sfc.get_rect()
         if self._alignment == "left":
-            self._rect.bottomleft = self._pos
+            rect.bottomleft = self._pos
         else:
-            self._rect.center = self._pos
+            rect.center = self._pos
+        return rect
+
+    def render(self) -> pygame.Rect | None:
+        """Draws the text if it changed since it was last drawn and returns the area
+        that changed, covering both the old and the new text"""
+        if not self._dirty:
+            return None
+        old_rect = self._rect
+        pygame.draw.rect(self._screen, GameColors.background.value, old_rect)
+        self._rect = self._place(self._sfc)
         self._screen.blit(self._sfc, self._rect)
+        self._dirty = False
+        return old_rect.union(self._rect)
 
     def set_text(self, new_text):
+        """Renders the new text once, when it differs from the current one"""
+        if new_text == self._txt:
+            return
         self._txt = new_text
+        self._sfc = self._font.render(self._txt, True, GameColors.title_font.value)
+        self._dirty = True
+
+    def invalidate(self):
+        """Draws the text again on the next render(), e.g. after the screen was cleared"""
+        self._dirty = True
 
 
 class PygameInterface:
     def __init__(self, new_game: Callable[[], domain.IGame]) -> None:
         pygame.init()
         self._font = pygame.font.SysFont("Arial", 30)
-        self._piece_size = 50
         self._screen = pygame.display.set_mode((1280, 720))
-        self._padding = 10  # space between pieces in board
+        self._game = new_game()
+        columns = self._game.board().columns()
+        rows = self._game.board().rows()
+        # cells shrink from 60 pixels so the board fits between the stats on the
+        # left, the titles above and the buttons below
+        cell_size = min(60, 560 // columns, 440 // rows)
+        self._piece_size = cell_size * 5 // 6
+        self._padding = cell_size - self._piece_size  # space between pieces in board
         self._column_width = (self._piece_size) + self._padding  # total width of column
         self._row_height = (self._piece_size) + self._padding  # total height of row
-        self._board_width = self._column_width * 7
-        self._board_height = self._row_height * 6
+        self._board_width = self._column_width * columns
+        self._board_height = self._row_height * rows
         self._board_left = (self._screen.get_width() // 2) - (self._board_width // 2)
         self._board_top = (self._screen.get_height() // 2) - (self._board_height // 2)
         self._board_rect = pygame.Rect(
             self._board_left, self._board_top, self._board_width, self._board_height
         )
-        self._game = new_game()
         self._new_game = new_game
         self._board = self._game.board()
         self._clock = pygame.time.Clock()
         self._running = True
         self._timer_start = pygame.time.get_ticks()
         self._timer_complete = False
+        self._ai_thinking = False
+        self._pondering = False
         self._game_over = False
         self._move_made = False
+        self._drawn_key: int | None = None
+        """Key of the position currently on screen, None when the board must be redrawn"""
+        self._drawn_cells: dict[tuple[int, int], tuple[int, bool]] = {}
+        """(row, col) -> (piece, highlighted) as last drawn"""
+        self._redraw_all = True
         self._font = pygame.font.SysFont("Arial", 30)
         self._title = Text(
             "It's player 1's turn",
@@ -132,8 +178,10 @@ class PygameInterface:
             self._font,
         )
         self._last_move = 0
+        self._col_key_map = dict(zip(column_keys, range(columns)))
+        header_font = pygame.font.SysFont("Arial", min(30, cell_size * 2 // 3))
         self._col_headers: list[Button] = []
-        for col in range(self._game.board().columns()):
+        for col in range(columns):
             pos = (
                 self._board_left
                 + (self._column_width * col)
@@ -144,11 +192,11 @@ class PygameInterface:
                 str(col + 1),
                 self._screen,
                 pos,
-                self._font,
+                header_font,
             )
             self._col_headers.append(col_header)
         self._subtitle = Text(
-            "Type or click 1-7 to drop your game piece",
+            f"Type or click 1-{columns} to drop your game piece",
             self._screen,
             (self._title._pos[0], self._title._pos[1] + 40),
             self._font,
@@ -177,6 +225,13 @@ class PygameInterface:
             self._font,
             alignment="left",
         )
+        self._expected_line = Text(
+            "Expected line: -",
+            self._screen,
+            (self._nodes_explored._pos[0], self._nodes_explored._pos[1] + 120),
+            self._font,
+            alignment="left",
+        )
         self._restart_btn = Button(
             "Restart",
             self._screen,
@@ -198,6 +253,7 @@ class PygameInterface:
             self._nodes_explored,
             self._total_nodes,
             self._turn_duration,
+            self._expected_line,
         ]
 
     def _draw_piece(self, player: int, pos: pygame.Vector2):
@@ -223,52 +279,74 @@ class PygameInterface:
         )
 
     def reset(self) -> None:
+        self._game.cancel_cpu_move()
+        self._ai_thinking = False
+        self._pondering = False
+        self._timer_complete = False
         self._game_over = False
         self._game = self._new_game()
         self._board = self._game.board()
         self._screen.fill((0, 0, 0))
+        self._invalidate()
         self._title.set_text("It's player 1's turn")
-        self._subtitle.set_text("Enter 1-7 to drop your game piece")
+        self._subtitle.set_text(
+            f"Enter 1-{self._board.columns()} to drop your game piece"
+        )
+
+    def _invalidate(self):
+        """Makes the next frame draw everything, for after the screen was cleared"""
+        for widget in (*self._game_text, *self._buttons):
+            widget.invalidate()
+        self._drawn_key = None
+        self._drawn_cells = {}
+        self._redraw_all = True
 
     def _refresh_stats(self):
-        self._nodes_explored.set_text(
-            f"Nodes explored: {self._game.stats().nodes_explored}"
-        )
-        self._total_nodes.set_text(f"Total explored: {self._game.stats().total_nodes}")
-        duration = round(self._game.stats().turn_duration * 1000, 1)
+        stats = self._game.stats()
+        self._nodes_explored.set_text(f"Nodes explored: {stats.nodes_explored}")
+        self._total_nodes.set_text(f"Total explored: {stats.total_nodes}")
+        duration = round(stats.turn_duration * 1000, 1)
         self._turn_duration.set_text(f"P2 turn duration: {duration} ms")
+        line = to_move_string(stats.principal_variation) or "-"
+        self._expected_line.set_text(f"Expected line: {line}")
+
+    def _column_at(self, x: int) -> int:
+        return (x - self._board_left) // self._column_width
 
     def _player(self):
         return self._game.current_player()
 
-    def _render_board(self):
-        pygame.draw.rect(self._screen, GameColors.board.value, self._board_rect)
-        grid = self._board.states_grid()
-        row_num = 0
-        for row in grid:
-            col = 0
-            for cell in row:
+    def _render_board(self) -> list[pygame.Rect]:
+        """Redraws the cells that changed since the last frame and returns their areas"""
+        key = self._board.key()
+        if key == self._drawn_key:
+            return []
+        self._drawn_key = key
+        dirty = []
+        if not self._drawn_cells:
+            pygame.draw.rect(self._screen, GameColors.board.value, self._board_rect)
+            dirty.append(self._board_rect)
+        last_added = self._board.last_added()
+        for row_num, row in enumerate(self._board.states_grid()):
+            for col, cell in enumerate(row):
+                shown = (cell, cell != 0 and (row_num, col) == last_added)
+                if self._drawn_cells.get((row_num, col)) == shown:
+                    continue
+                self._drawn_cells[(row_num, col)] = shown
                 pos = pygame.Vector2(
                     self._board_left + self._column_width * col,
                     self._board_top + self._row_height * row_num,
                 )
-                # label columns with numbers 1 - 7
-                not_empty = False
-                if cell == 1:
-                    self._draw_piece(1, pos)
-                    not_empty = True
-                elif cell == 2:
-                    self._draw_piece(2, pos)
-                    not_empty = True
-                if not_empty:
-                    if (row_num, col) == self._board.last_added():
-                        self._highlight_piece(pos)
-                else:
-                    self._draw_piece(0, pos)
-                col += 1
-            row_num += 1
+                cell_rect = pygame.Rect(pos, (self._column_width, self._row_height))
+                pygame.draw.rect(self._screen, GameColors.board.value, cell_rect)
+                self._draw_piece(cell, pos)
+                if shown[1]:
+                    self._highlight_piece(pos)
+                dirty.append(cell_rect)
+        return dirty
 
     def quit(self):
+        self._game.cancel_cpu_move()
         self._run = False
 
     def run(self):
@@ -278,22 +356,30 @@ class PygameInterface:
             # pygame.QUIT event means the user clicked X to close your window
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    self._run = False
+                    self.quit()
+
+                # quit and restart stay clickable while the AI is searching
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    if self._quit_btn._rect.collidepoint(event.pos):
+                        self.quit()
+                    if self._restart_btn._rect.collidepoint(event.pos):
+                        self.reset()
 
                 if event.type == pygame.MOUSEBUTTONDOWN and self._player() == 1:
                     if event.button == 1:  # Left mouse button
                         print(f"Mouse clicked! click pos: {event.pos}")
-                        if self._quit_btn._rect.collidepoint(event.pos):
-                            self.quit()
-                        if self._restart_btn._rect.collidepoint(event.pos):
-                            self.reset()
                         print(f"length of col headers: {len(self._col_headers)}")
                         for i, header in enumerate(self._col_headers):
                             print(f"header: {header._txt} pos: {header._pos}")
-                            if header._rect.collidepoint(event.pos):
+                            # headers of narrow columns overlap, so the one
+                            # nearest the click wins
+                            if header._rect.collidepoint(
+                                event.pos
+                            ) and i == self._column_at(event.pos[0]):
                                 print(f"header clicked! {header._txt}")
-                                self._board.accept_move(i, 1)
+                                self._game.play_move(i, 1)
                                 self._move_made = True
+                                self._pondering = False
                                 self._timer_start = pygame.time.get_ticks()
 
             keys = pygame.key.get_pressed()
@@ -315,21 +401,35 @@ class PygameInterface:
                         self._title.set_text(text)
                         self._subtitle.set_text("Press q to quit, r to restart game.")
                         self._game_over = True
-                if self._player() == 1:
-                    for key, column in col_key_map.items():
+                if self._game_over:
+                    self._game.stop_pondering()
+                    self._pondering = False
+                elif self._player() == 1:
+                    if not self._pondering:
+                        # let the AI think about its replies on the human's time
+                        self._game.begin_pondering()
+                        self._pondering = True
+                    for key, column in self._col_key_map.items():
                         if keys[key]:
-                            self._board.accept_move(col_key_map[key], 1)
+                            self._game.play_move(column, 1)
                             self._move_made = True
+                            self._pondering = False
                             self._timer_start = pygame.time.get_ticks()
                 elif self._player() == 2:
                     current_time = pygame.time.get_ticks()
                     if current_time - self._timer_start > 200:
                         self._timer_complete = True
-                    if self._timer_complete:
-                        move = self._game.get_player_input(2)
-                        self._board.accept_move(move, 2)
-                        self._move_made = True
+                    if self._timer_complete and not self._ai_thinking:
+                        # search on a worker thread so the window keeps responding
+                        self._game.begin_cpu_move()
+                        self._ai_thinking = True
                         self._timer_complete = False
+                    if self._ai_thinking:
+                        move = self._game.poll_cpu_move()
+                        if move is not None:
+                            self._ai_thinking = False
+                            self._game.play_move(move, 2)
+                            self._move_made = True
 
             else:
                 for key, choice in self.menu_key_map.items():
@@ -337,12 +437,18 @@ class PygameInterface:
                         self.menu_key_map[key]()
 
             self._refresh_stats()
-            for text in self._game_text:
-                text.render()
-            for button in self._buttons:
-                button.render()
-            self._render_board()
-            pygame.display.flip()
+            dirty = self._render_board()
+            for widget in (*self._game_text, *self._buttons):
+                rect = widget.render()
+                if rect is not None:
+                    dirty.append(rect)
+            # push only what changed, and leave the rest of the frame to the AI threads
+            if self._redraw_all:
+                pygame.display.flip()
+                self._redraw_all = False
+            elif dirty:
+                pygame.display.update(dirty)
+            self._clock.tick(FRAME_RATE)
 
 
 pygame.quit()
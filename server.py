@@ -0,0 +1,379 @@
+"""Asyncio server hosting many concurrent games against the CPU player.
+
+    python server.py serve --port 5153 --workers 4
+    python server.py serve --unix /tmp/connect4.sock
+    python server.py load --port 5153 --games 200
+
+Clients send one JSON object per line and get one JSON object back per line:
+
+    {"op": "new", "rows": 6, "columns": 7, "connect": 4, "first": "human"}
+    {"op": "move", "session": 1, "column": 4}
+    {"op": "state", "session": 1}
+    {"op": "close", "session": 1}
+    {"op": "stats"}
+
+Columns are 1-based. Every reply has "ok", and "error" when it is false. Game
+replies also carry the session, the moves so far as a move string and a
+"status" of "playing", "human_won", "cpu_won" or "draw"; "move" adds the CPU's
+reply as "cpu_column".
+
+CPU moves are searched by a process pool. At most `workers` searches run at once
+and at most `max_queue` more wait for a worker; past that, moves are refused
+with "server busy" so a slow pool can't pile up unbounded work. A move that
+doesn't get its answer within `move_timeout` seconds, queueing included, is
+refused with "timeout" and the human's move is taken back so it can be sent
+again.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import math
+import random
+import sys
+import time
+from board import new_board, new_board_from_moves, parse_move_string, to_move_string
+from cpu_player import AIPlayer, new_cpu_player, possible_moves
+from domain import IBoard
+from opening_book import load_opening_book
+
+LATENCY_SAMPLES = 1000
+"""CPU moves kept for the latency percentiles"""
+
+
+class RequestError(Exception):
+    """A request that can't be served; its message is sent back to the client"""
+
+
+class Session:
+    def __init__(self, board: IBoard, cpu_player: int) -> None:
+        self.board = board
+        self.cpu_player = cpu_player
+        self.lock = asyncio.Lock()
+        """Serialises requests for this game when a client pipelines them"""
+
+    def status(self) -> str:
+        for player in (1, 2):
+            if self.board.check_win(player):
+                return "cpu_won" if player == self.cpu_player else "human_won"
+        if self.board.is_full():
+            return "draw"
+        return "playing"
+
+    def next_player(self) -> int:
+        return self.board.piece_count() % 2 + 1
+
+
+class GameServer:
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 64,
+        move_timeout: float = 10.0,
+        time_budget: float = 1.0,
+    ) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.move_timeout = move_timeout
+        self.time_budget = time_budget
+        """Seconds each CPU search is given; keep it well under `move_timeout`"""
+        self.__pool = ProcessPoolExecutor(workers)
+        self.__slots = asyncio.Semaphore(workers)
+        self.__sessions: dict[int, Session] = {}
+        self.__next_session = 1
+        self.__queued = 0
+        self.__in_flight = 0
+        self.__latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def close(self):
+        self.__pool.shutdown(cancel_futures=True)
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise RequestError("requests must be JSON objects")
+                    reply = {"ok": True, **await self.dispatch(request)}
+                except (RequestError, TypeError, ValueError) as error:
+                    reply = {"ok": False, "error": str(error)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "new":
+            return await self.__new(request)
+        if op == "stats":
+            return self.stats()
+        session_id = request.get("session")
+        session = self.__sessions.get(session_id)
+        if session is None:
+            raise RequestError(f"no session {session_id}")
+        if op == "move":
+            async with session.lock:
+                reply = await self.__move(session, request.get("column"))
+        elif op == "state":
+            reply = {}
+        elif op == "close":
+            del self.__sessions[session_id]
+            return {"session": session_id}
+        else:
+            raise RequestError(f"unknown op {op!r}")
+        return {**self.__describe(session_id, session), **reply}
+
+    def stats(self) -> dict:
+        latencies = sorted(self.__latencies)
+        return {
+            "sessions": len(self.__sessions),
+            "queued": self.__queued,
+            "in_flight": self.__in_flight,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "latency_ms": {
+                f"p{percent}": round(percentile(latencies, percent) * 1000, 1)
+                for percent in (50, 90, 99)
+            },
+        }
+
+    async def __new(self, request: dict) -> dict:
+        rows = int(request.get("rows", 6))
+        columns = int(request.get("columns", 7))
+        win_length = int(request.get("connect", 4))
+        if not (1 <= rows <= 64 and 1 <= columns <= 64 and 1 <= win_length):
+            raise RequestError("board size out of range")
+        cpu_player = 1 if request.get("first") == "cpu" else 2
+        session = Session(new_board(columns, rows, win_length=win_length), cpu_player)
+        session_id = self.__next_session
+        self.__next_session += 1
+        self.__sessions[session_id] = session
+        reply = {}
+        if cpu_player == 1:
+            try:
+                async with session.lock:
+                    reply["cpu_column"] = await self.__cpu_move(session) + 1
+            except BaseException:
+                # the game can't start without the CPU's first move
+                del self.__sessions[session_id]
+                raise
+        return {**self.__describe(session_id, session), **reply}
+
+    async def __move(self, session: Session, column) -> dict:
+        if session.status() != "playing":
+            raise RequestError("the game is over")
+        if session.next_player() == session.cpu_player:
+            raise RequestError("waiting for the CPU's move")
+        # bool is an int too, but JSON true isn't a column
+        if (
+            isinstance(column, bool)
+            or not isinstance(column, int)
+            or not 1 <= column <= session.board.columns()
+        ):
+            raise RequestError(f"column must be 1-{session.board.columns()}")
+        if not session.board.accept_move(column - 1, session.next_player()):
+            raise RequestError(f"column {column} is full")
+        if session.status() != "playing":
+            return {}
+        try:
+            return {"cpu_column": await self.__cpu_move(session) + 1}
+        except BaseException:
+            # whatever stopped the CPU's reply, including the client going away,
+            # take the human's move back so the game stays in step with the client
+            session.board.undo_move()
+            raise
+
+    async def __cpu_move(self, session: Session) -> int:
+        """Searches the session's position in the pool and plays the move found"""
+        if self.__queued >= self.max_queue:
+            self.rejected += 1
+            raise RequestError("server busy")
+        start = time.perf_counter()
+        try:
+            column = await asyncio.wait_for(
+                self.__search(session.board), self.move_timeout
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise RequestError("timeout") from None
+        except Exception as error:
+            # e.g. a worker process died; the client still gets a reply
+            raise RequestError("search failed") from error
+        self.__latencies.append(time.perf_counter() - start)
+        self.completed += 1
+        session.board.accept_move(column, session.cpu_player)
+        return column
+
+    async def __search(self, board: IBoard) -> int:
+        self.__queued += 1
+        try:
+            await self.__slots.acquire()
+        finally:
+            self.__queued -= 1
+        self.__in_flight += 1
+        future = asyncio.get_running_loop().run_in_executor(
+            self.__pool,
+            _search_move,
+            board.rows(),
+            board.columns(),
+            board.win_length(),
+            board.moves(),
+            self.time_budget,
+        )
+
+        # the slot is freed when the worker is, even if the client gave up waiting
+        def release(_):
+            self.__in_flight -= 1
+            self.__slots.release()
+
+        future.add_done_callback(release)
+        return await asyncio.shield(future)
+
+    def __describe(self, session_id: int, session: Session) -> dict:
+        return {
+            "session": session_id,
+            "moves": to_move_string(session.board.moves()),
+            "status": session.status(),
+        }
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted `values`, 0 when there are none"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+_engines: dict[tuple, tuple[AIPlayer, IBoard]] = {}
+"""One engine per board configuration and side, kept for the life of the worker so
+its transposition table stays warm across sessions"""
+
+
+def _search_move(
+    rows: int, columns: int, win_length: int, moves: list[int], time_budget: float
+) -> int:
+    """Runs in a pool worker and returns the best move for the side to move"""
+    player = len(moves) % 2 + 1
+    config = (rows, columns, win_length, player)
+    if config not in _engines:
+        board = new_board(columns, rows, win_length=win_length)
+        engine = new_cpu_player(
+            board, player, 3 - player, opening_book=load_opening_book()
+        )
+        _engines[config] = (engine, board)
+    engine, board = _engines[config]
+    # the engine searches the board it was built with, so replay the game onto it
+    while board.undo_move():
+        pass
+    for turn, col in enumerate(moves):
+        board.accept_move(col, turn % 2 + 1)
+    engine.time_budget = time_budget
+    return engine.move()
+
+
+async def serve(args: argparse.Namespace):
+    server = GameServer(args.workers, args.max_queue, args.timeout, args.time_budget)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle_client, args.unix)
+    else:
+        listener = await asyncio.start_server(
+            server.handle_client, args.host, args.port
+        )
+    print(f"Serving on {args.unix or f'{args.host}:{args.port}'}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+async def connect(args: argparse.Namespace):
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def request(reader, writer, message: dict) -> dict:
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def play_random_game(args: argparse.Namespace, seed: int) -> str:
+    """Plays one game of random human moves on its own connection and returns how it ended"""
+    rng = random.Random(seed)
+    reader, writer = await connect(args)
+    try:
+        reply = await request(reader, writer, {"op": "new"})
+        session = reply["session"]
+        while reply["ok"] and reply["status"] == "playing":
+            board = new_board_from_moves(parse_move_string(reply["moves"]))
+            column = rng.choice(possible_moves(board)) + 1
+            reply = await request(
+                reader, writer, {"op": "move", "session": session, "column": column}
+            )
+        await request(reader, writer, {"op": "close", "session": session})
+        return reply["status"] if reply["ok"] else reply["error"]
+    finally:
+        writer.close()
+
+
+async def load(args: argparse.Namespace):
+    """Plays `games` concurrent games of random moves and prints the server's stats"""
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(play_random_game(args, seed) for seed in range(args.games))
+    )
+    elapsed = time.perf_counter() - start
+    outcomes = {outcome: results.count(outcome) for outcome in sorted(set(results))}
+    print(f"{args.games} games in {elapsed:.1f}s: {outcomes}")
+    reader, writer = await connect(args)
+    print(json.dumps(await request(reader, writer, {"op": "stats"})))
+    writer.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("serve", "host games"),
+        ("load", "play concurrent random games against a running server"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=5153)
+        command.add_argument("--unix", help="Unix socket path, instead of TCP")
+        if name == "serve":
+            command.add_argument("--workers", type=int, default=4)
+            command.add_argument("--max-queue", type=int, default=64)
+            command.add_argument(
+                "--timeout", type=float, default=10.0, help="seconds per CPU move"
+            )
+            command.add_argument(
+                "--time-budget", type=float, default=0.5, help="search seconds"
+            )
+        else:
+            command.add_argument("--games", type=int, default=50)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args) if args.command == "serve" else load(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
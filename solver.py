@@ -0,0 +1,200 @@
+"""Exact solver for positions close to the end of the game.
+
+A port of the classic bitboard Connect 4 solver: negamax with alpha-beta
+pruning, driven by a sequence of null-window searches that bisect the range of
+possible scores. It never plays a move that lets the opponent win on the spot,
+orders moves by how many winning cells they create, and keeps upper bounds in
+a transposition table.
+
+Scores follow the usual convention: 0 is a draw, a positive score means the
+side to move wins, and the sooner the win the bigger the score. A win played
+with the winner's n-th piece scores (cells / 2 + 1 - n).
+"""
+
+from __future__ import annotations
+from typing import Callable
+from domain import IBoard
+from move_ordering import center_out
+
+
+class SolveResult:
+    def __init__(self, score: int, best_move: int, distance: int, nodes: int) -> None:
+        self.score = score
+        self.best_move = best_move
+        self.distance = distance
+        """Plies until the game ends with perfect play from both sides, counting the best move"""
+        self.nodes = nodes
+
+    @property
+    def value(self) -> int:
+        """1 if the side to move wins, 0 for a draw, -1 if it loses"""
+        return (self.score > 0) - (self.score < 0)
+
+
+class Solver:
+    @staticmethod
+    def supports(board: IBoard) -> bool:
+        """The bitboard tricks used here only find lines of exactly four"""
+        return board.win_length() == 4
+
+    def __init__(
+        self,
+        rows: int = 6,
+        cols: int = 7,
+        tt_size: int = (1 << 20) + 7,
+        check_interval: int = 4096,
+    ) -> None:
+        """`tt_size` should be odd (ideally prime) so keys spread over the table"""
+        self.__rows = rows
+        self.__cols = cols
+        self.__cells = rows * cols
+        self.__col_bits = rows + 1
+        self.__bottom_mask = sum(1 << (col * self.__col_bits) for col in range(cols))
+        self.__board_mask = self.__bottom_mask * ((1 << rows) - 1)
+        self.__column_masks = [
+            ((1 << rows) - 1) << (col * self.__col_bits) for col in range(cols)
+        ]
+        self.__order = center_out(cols)
+        self.__min_score = -(self.__cells // 2) + 3
+        self.__tt_keys = [0] * tt_size
+        self.__tt_values = [0] * tt_size
+        self.__check_interval = check_interval
+        self.nodes = 0
+        self.check: Callable[[], None] | None = None
+        """Called every `check_interval` nodes; raise from it to abandon the solve"""
+
+    def solve(self, board: IBoard, player: int) -> SolveResult:
+        """Solves the position for `player`, who is to move. The board must have a
+        legal move left and must not already be won."""
+        self.nodes = 0
+        position = board.pieces(player)
+        mask = position | board.pieces(3 - player)
+        moves = board.piece_count()
+        best_move = -1
+        best_score = -self.__cells
+        for col in self.__order:
+            move = (mask + self.__bottom_mask) & self.__column_masks[col]
+            if not move:
+                continue
+            if self.__winning_cells(position, mask) & move:
+                best_move, best_score = col, (self.__cells + 1 - moves) // 2
+                break
+            if best_move < 0:
+                best_move = col
+            child_position, child_mask = position ^ mask, mask | move
+            if moves + 1 == self.__cells:
+                score = 0
+            else:
+                score = -self.__solve(child_position, child_mask, moves + 1)
+            if score > best_score:
+                best_move, best_score = col, score
+        return SolveResult(
+            best_score, best_move, self.__distance(best_score, moves), self.nodes
+        )
+
+    def __distance(self, score: int, moves: int) -> int:
+        if score == 0:
+            return self.__cells - moves
+        # the side that wins plays its last move at ply `end`, where
+        # score == (cells + 1 - end) // 2 and `end` has that side's parity
+        end = self.__cells + 1 - 2 * abs(score)
+        winner_parity = moves % 2 if score > 0 else (moves + 1) % 2
+        if end % 2 != winner_parity:
+            end -= 1
+        return end - moves + 1
+
+    def __solve(self, position: int, mask: int, moves: int) -> int:
+        """Exact score for the side to move, found by bisecting the score range
+        with null-window searches"""
+        if self.__winning_cells(position, mask) & self.__possible(mask):
+            return (self.__cells + 1 - moves) // 2
+        low = -((self.__cells - moves) // 2)
+        high = (self.__cells + 1 - moves) // 2
+        while low < high:
+            middle = low + (high - low) // 2
+            # bias the probes towards 0, where most positions end up
+            if middle <= 0 and -(-low // 2) < middle:
+                middle = -(-low // 2)
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            result = self.__negamax(position, mask, moves, middle, middle + 1)
+            if result <= middle:
+                high = result
+            else:
+                low = result
+        return low
+
+    def __negamax(
+        self, position: int, mask: int, moves: int, alpha: int, beta: int
+    ) -> int:
+        """Assumes the side to move can't win with its next move"""
+        self.nodes += 1
+        if self.check is not None and self.nodes % self.__check_interval == 0:
+            self.check()
+        cells = self.__cells
+        possible = self.__possible(mask)
+        opponent_wins = self.__winning_cells(position ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                # more than one cell to block, so the opponent wins next move
+                return -((cells - moves) // 2)
+            possible = forced
+        # never play directly below a cell where the opponent would win
+        next_moves = possible & ~(opponent_wins >> 1)
+        if not next_moves:
+            return -((cells - moves) // 2)
+        if moves >= cells - 2:
+            return 0
+        lowest = -((cells - 2 - moves) // 2)
+        if alpha < lowest:
+            alpha = lowest
+            if alpha >= beta:
+                return alpha
+        highest = (cells - 1 - moves) // 2
+        key = position + mask
+        slot = key % len(self.__tt_keys)
+        if self.__tt_keys[slot] == key:
+            highest = self.__tt_values[slot] + self.__min_score - 1
+        if beta > highest:
+            beta = highest
+            if alpha >= beta:
+                return beta
+        # order by the number of winning cells each move creates, center first on ties
+        candidates = []
+        for rank, col in enumerate(self.__order):
+            move = next_moves & self.__column_masks[col]
+            if move:
+                threats = (
+                    self.__winning_cells(position | move, mask) & ~mask
+                ).bit_count()
+                candidates.append((-threats, rank, move))
+        candidates.sort()
+        for _, _, move in candidates:
+            score = -self.__negamax(
+                position ^ mask, mask | move, moves + 1, -beta, -alpha
+            )
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        self.__tt_keys[slot] = key
+        self.__tt_values[slot] = alpha - self.__min_score + 1
+        return alpha
+
+    def __possible(self, mask: int) -> int:
+        return (mask + self.__bottom_mask) & self.__board_mask
+
+    def __winning_cells(self, position: int, mask: int) -> int:
+        """Empty cells that would complete a line of four for `position`"""
+        # vertical
+        cells = (position << 1) & (position << 2) & (position << 3)
+        # horizontal and both diagonals
+        for shift in (self.__col_bits, self.__col_bits - 1, self.__col_bits + 1):
+            pair = (position << shift) & (position << 2 * shift)
+            cells |= pair & (position << 3 * shift)
+            cells |= pair & (position >> shift)
+            pair = (position >> shift) & (position >> 2 * shift)
+            cells |= pair & (position << shift)
+            cells |= pair & (position >> 3 * shift)
+        return cells & (self.__board_mask ^ mask)
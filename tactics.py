@@ -0,0 +1,134 @@
+"""Tactical pre-pass run before the search: immediate wins, forced blocks, moves
+that hand the opponent a win, and odd/even threat classification.
+
+Everything works on the bitboards from IBoard.pieces(), so the whole pass is a
+few dozen shifts and masks whatever the board size or win length.
+
+Threats are empty cells that would complete a line for a player but can't be
+played yet. Counting rows from 1 at the bottom, zugzwang favours the first player
+(player 1) holding threats on odd rows and the second player threats on even
+rows: when the board fills up column by column, the player whose threat parity
+matches gets to play into it. AIPlayer reports these counts after every move and
+uses them to break ties in its root move ordering.
+"""
+
+from __future__ import annotations
+from domain import IBoard
+
+
+class Tactics:
+    def __init__(self) -> None:
+        self.wins: list[int] = []
+        """Columns that win at once for the player to move"""
+        self.blocks: list[int] = []
+        """Columns where the opponent would win at once; with more than one the game is lost"""
+        self.unsafe: list[int] = []
+        """Columns whose move lets the opponent win on the cell directly above"""
+        self.moves: list[int] = []
+        """Moves worth searching: every legal move that doesn't lose at once, or
+        every legal move when they all do"""
+        self.forced: int | None = None
+        """The move to play without searching, when there is only one sensible move"""
+        self.odd_threats: dict[int, int] = {}
+        """Player -> bitboard of their threats on odd rows"""
+        self.even_threats: dict[int, int] = {}
+        """Player -> bitboard of their threats on even rows"""
+
+    def good_threats(self, player: int) -> int:
+        """How many of player's threats have the parity zugzwang favours for them"""
+        threats = self.odd_threats if player == 1 else self.even_threats
+        return threats[player].bit_count()
+
+
+def analyze_tactics(board: IBoard, player: int) -> Tactics:
+    """Tactics of the position for `player`, who is to move"""
+    rows, columns = board.rows(), board.columns()
+    col_bits = rows + 1
+    bottom = sum(1 << (col * col_bits) for col in range(columns))
+    board_mask = bottom * ((1 << rows) - 1)
+    odd_rows = bottom * sum(1 << row for row in range(0, rows, 2))
+    opponent = 3 - player
+    mine, theirs = board.pieces(player), board.pieces(opponent)
+    mask = mine | theirs
+    playable = (mask + bottom) & board_mask
+    win_length = board.win_length()
+    my_cells = winning_cells(mine, mask, board_mask, col_bits, win_length)
+    their_cells = winning_cells(theirs, mask, board_mask, col_bits, win_length)
+    tactics = Tactics()
+    legal = _columns(playable, col_bits)
+    tactics.wins = _columns(my_cells & playable, col_bits)
+    tactics.blocks = _columns(their_cells & playable, col_bits)
+    tactics.unsafe = _columns((their_cells >> 1) & playable, col_bits)
+    for side, cells in ((player, my_cells), (opponent, their_cells)):
+        threats = cells & ~playable
+        tactics.odd_threats[side] = threats & odd_rows
+        tactics.even_threats[side] = threats & ~odd_rows
+    if tactics.wins:
+        tactics.forced = tactics.wins[0]
+        tactics.moves = tactics.wins
+        return tactics
+    if len(tactics.blocks) == 1:
+        # blocking is the only move that doesn't lose at once, even if it loses next
+        tactics.forced = tactics.blocks[0]
+        tactics.moves = tactics.blocks
+        return tactics
+    if tactics.blocks:
+        tactics.moves = legal
+        return tactics
+    tactics.moves = [col for col in legal if col not in tactics.unsafe] or legal
+    if len(tactics.moves) == 1:
+        tactics.forced = tactics.moves[0]
+    return tactics
+
+
+def winning_cells(
+    position: int, mask: int, board_mask: int, col_bits: int, win_length: int
+) -> int:
+    """Empty cells that would complete a line of `win_length` for `position`. A
+    cell qualifies when, along some direction, the other cells of a line through
+    it are all in `position`."""
+    cells = 0
+    # up, along a row, and both diagonals; the empty bit topping each column
+    # breaks lines that would wrap from one column into the next
+    for step in (1, col_bits, col_bits - 1, col_bits + 1):
+        for target in range(win_length):
+            line = board_mask
+            for index in range(win_length):
+                offset = (index - target) * step
+                if offset > 0:
+                    line &= position >> offset
+                elif offset < 0:
+                    line &= position << -offset
+            cells |= line
+    return cells & (board_mask ^ mask)
+
+
+def _columns(cells: int, col_bits: int) -> list[int]:
+    columns = []
+    while cells:
+        bit = cells & -cells
+        col = (bit.bit_length() - 1) // col_bits
+        if not columns or columns[-1] != col:
+            columns.append(col)
+        cells ^= bit
+    return columns
+
+
+def good_threat_counts(board: IBoard, player: int) -> tuple[int, int]:
+    """Threats with the parity zugzwang favours held by `player` and by their
+    opponent, whoever is to move"""
+    tactics = analyze_tactics(board, player)
+    return tactics.good_threats(player), tactics.good_threats(3 - player)
+
+
+def parity_balance(board: IBoard, player: int, moves: list[int]) -> dict[int, int]:
+    """Move -> good threats `player` holds minus the opponent's once it is played"""
+    balance = {}
+    for move in moves:
+        board.accept_move(move, player)
+        try:
+            mine, theirs = good_threat_counts(board, player)
+        finally:
+            board.undo_move()
+        balance[move] = mine - theirs
+    return balance
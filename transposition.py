@@ -0,0 +1,125 @@
+from __future__ import annotations
+from enum import Enum
+from typing import Iterator
+
+
+class Bound(Enum):
+    Exact = 0
+    Lower = 1
+    Upper = 2
+
+
+class ReplacementPolicy(Enum):
+    AlwaysReplace = 0
+    """A new entry always overwrites the slot"""
+    DepthPreferred = 1
+    """A new entry only overwrites an entry for another position searched less deep"""
+    TwoTier = 2
+    """Each bucket has a depth-preferred slot and an always-replace slot"""
+
+
+class TTEntry:
+    __slots__ = ("key", "depth", "score", "bound", "best_move")
+
+    def __init__(
+        self, key: int, depth: int, score: float, bound: Bound, best_move: int
+    ) -> None:
+        self.key = key
+        self.depth = depth
+        """Remaining search depth the score was computed with"""
+        self.score = score
+        self.bound = bound
+        self.best_move = best_move
+
+
+class TranspositionTable:
+    """Fixed-capacity table of searched positions, keyed by Zobrist hash.
+
+    Entries live in `max_entries` slots addressed by `key % buckets`, so memory is
+    bounded by the cap no matter how long the table is used. When a slot is taken
+    by a different position the replacement policy decides which entry survives.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1 << 16,
+        policy: ReplacementPolicy = ReplacementPolicy.TwoTier,
+    ) -> None:
+        if max_entries < 2:
+            raise ValueError("A transposition table needs at least two entries")
+        self.__policy = policy
+        self.__ways = 2 if policy == ReplacementPolicy.TwoTier else 1
+        self.__buckets = max_entries // self.__ways
+        self.__slots: list[TTEntry | None] = [None] * (self.__buckets * self.__ways)
+        self.__used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stores = 0
+
+    def __len__(self) -> int:
+        return self.__used
+
+    def capacity(self) -> int:
+        return len(self.__slots)
+
+    def probe(self, key: int) -> TTEntry | None:
+        start = (key % self.__buckets) * self.__ways
+        for slot in range(start, start + self.__ways):
+            entry = self.__slots[slot]
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def store(
+        self, key: int, depth: int, score: float, bound: Bound, best_move: int
+    ) -> None:
+        start = (key % self.__buckets) * self.__ways
+        slot = self.__select_slot(key, depth, start)
+        if slot < 0:
+            return
+        previous = self.__slots[slot]
+        if previous is None:
+            self.__used += 1
+        elif previous.key != key:
+            self.evictions += 1
+        self.__slots[slot] = TTEntry(key, depth, score, bound, best_move)
+        self.stores += 1
+
+    def entries(self) -> Iterator[TTEntry]:
+        """Every entry currently held, in slot order"""
+        return (entry for entry in self.__slots if entry is not None)
+
+    def clear(self) -> None:
+        self.__slots = [None] * len(self.__slots)
+        self.__used = 0
+
+    def __select_slot(self, key: int, depth: int, start: int) -> int:
+        """Returns the slot the new entry goes into, or -1 if it should be dropped"""
+        if self.__policy == ReplacementPolicy.AlwaysReplace:
+            return start
+        deep = self.__slots[start]
+        if self.__policy == ReplacementPolicy.DepthPreferred:
+            if deep is None or deep.key == key or deep.depth <= depth:
+                return start
+            return -1
+        # Two-tier: keep the deepest result in the first slot, and let the second
+        # slot hold whatever was stored most recently.
+        recent = self.__slots[start + 1]
+        if deep is None or deep.key == key or deep.depth <= depth:
+            if deep is not None and deep.key != key:
+                # demote the old deep entry rather than losing it outright
+                if recent is not None and recent.key != key:
+                    self.evictions += 1
+                if recent is None:
+                    self.__used += 1
+                self.__slots[start + 1] = deep
+                self.__slots[start] = None
+                self.__used -= 1
+            elif recent is not None and recent.key == key:
+                self.__slots[start + 1] = None
+                self.__used -= 1
+            return start
+        return start + 1
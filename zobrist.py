@@ -0,0 +1,31 @@
+import random
+from functools import lru_cache
+
+
+class ZobristKeys:
+    """Random 64-bit keys, one per (player, cell), for incremental position hashing.
+
+    A position's hash is the XOR of the keys of every occupied cell, so placing or
+    removing a piece is a single XOR. The generator is seeded so hashes are stable
+    between runs and processes.
+    """
+
+    def __init__(self, rows: int, cols: int, seed: int = 5153) -> None:
+        rng = random.Random(seed)
+        self.__rows = rows
+        self.__cols = cols
+        # indexed by player number, slot 0 unused
+        self.__keys: list[list[int]] = [
+            [0] * (rows * cols),
+            [rng.getrandbits(64) for _ in range(rows * cols)],
+            [rng.getrandbits(64) for _ in range(rows * cols)],
+        ]
+
+    def key(self, player: int, row: int, col: int) -> int:
+        return self.__keys[player][row * self.__cols + col]
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(rows: int, cols: int) -> ZobristKeys:
+    """Returns the shared key set for a board size"""
+    return ZobristKeys(rows, cols)